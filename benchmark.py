@@ -0,0 +1,283 @@
+"""Headless benchmarks of the engine: hot-path kernels and whole searches.
+
+    python benchmark.py                      # JSON report on stdout
+    python benchmark.py -o run.json --search-time 5
+
+Every run uses fixed seeds, and each function is called once before it is
+timed so JIT compilation (or loading it from the cache) is reported apart
+from the timings. "micro" times calls through the Python API, where unboxing
+the tree's arrays can cost more than the kernel itself; "kernels" times the
+hot kernels in jitted loops, with none of that overhead. The searches run
+without the threat solver, which would answer some positions before a single
+playout; it is timed on its own.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numba
+import numpy as np
+from numba import njit
+
+from connect6_engine import (BOARD_SIZE, SOLVER_TIME, UCT, GameState, MonteCarloTreeSearch, best_uct_child,
+                             check_win, expand_node, find_candidates, perform_random_play, player_for_turn,
+                             run_playout, seed_rng, solve)
+
+MOVES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "moves.txt")
+
+
+def load_moves(path=MOVES_FILE):
+    """Board and last stone of a file saved by the GUI."""
+    state = GameState.load(path)
+    return state.board, state.last_move
+
+
+def random_position(stones, seed, spread=BOARD_SIZE):
+    """`stones` stones played in turn order at random cells no further than
+    `spread` from the centre, none of them connecting six."""
+    rng = random.Random(seed)
+    board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+    low = max(BOARD_SIZE // 2 - spread, 0)
+    high = min(BOARD_SIZE // 2 + spread, BOARD_SIZE - 1)
+    position = None
+    turn = 0
+    while turn < stones:
+        row, col = rng.randint(low, high), rng.randint(low, high)
+        if board[row, col] != 0:
+            continue
+        player = player_for_turn(turn)
+        board[row, col] = player
+        if check_win(row, col, board, player):
+            board[row, col] = 0
+            continue
+        position = (row, col)
+        turn += 1
+    return board, position
+
+
+def positions(seed):
+    centre = BOARD_SIZE // 2
+    opening = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+    opening[centre, centre] = 1
+    result = {"opening": (opening, (centre, centre)),
+              "midgame": random_position(40, seed, spread=6),
+              "crowded": random_position(250, seed)}
+    if os.path.exists(MOVES_FILE):
+        result["moves.txt"] = load_moves()
+    return result
+
+
+def time_calls(function, calls):
+    """Mean and best time of one call of function(), in microseconds."""
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"calls": calls, "mean_us": 1e6 * sum(times) / calls, "min_us": 1e6 * min(times)}
+
+
+def time_kernel(function, calls, blocks=10):
+    """Mean and best time of one iteration of function(n), which runs a kernel
+    n times in a jitted loop, in microseconds (the best over `blocks` runs)."""
+    n = max(calls // blocks, 1)
+    times = []
+    for _ in range(blocks):
+        start = time.perf_counter()
+        function(n)
+        times.append((time.perf_counter() - start) / n)
+    return {"calls": n * blocks, "mean_us": 1e6 * sum(times) / blocks, "min_us": 1e6 * min(times)}
+
+
+@njit(cache=True)
+def repeat_best_uct_child(nodes, node, config, tt, n):
+    total = 0
+    for _ in range(n):
+        total += best_uct_child(nodes, node, config, tt)
+    return total
+
+
+@njit(cache=True)
+def repeat_expand_node(nodes, board, cands, config, n):
+    for _ in range(n):
+        if expand_node(nodes, board, 0, cands, config) == -1:
+            # Every move of the root is tried: drop its children and start over
+            nodes.size[0] = 1
+            nodes.pool_size[0] = 0
+            nodes.untried_start[0] = -1
+            nodes.first_child[0] = -1
+            nodes.n_children[0] = 0
+
+
+@njit(cache=True)
+def repeat_run_playout(board, row, col, current_player, config, played, n):
+    total = 0
+    for _ in range(n):
+        total += run_playout(board, row, col, current_player, config, played)[0]
+    return total
+
+
+def warm_up(function):
+    """Seconds the first call takes: JIT compilation or cache loading plus one run."""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def new_engine(board, position, seed, options):
+    engine = MonteCarloTreeSearch(seed=seed, solver_time=0, **options)
+    turn = int(np.count_nonzero(board)) - 1
+    engine.tree.set_root(board, position, turn + 1)
+    return engine, turn
+
+
+def micro_benchmarks(board, position, calls, seed, options):
+    """Per-call timings of the kernels the search spends its time in, called through the Python API."""
+    engine, turn = new_engine(board, position, seed, options)
+    seed_rng(seed)
+    row, col = position
+    player = int(board[row, col])
+
+    def random_play():
+        _, move = perform_random_play(board, turn + 1)
+        board[move[0], move[1]] = 0
+
+    def expand():
+        # A fresh root once all its moves are tried, so every call adds a node
+        if engine.expandNode(0) == -1:
+            engine.tree.set_root(board, position, turn + 1)
+
+    benchmarks = {
+        "check_win": lambda: check_win(row, col, board, player),
+        "perform_random_play": random_play,
+        "simulateRandomPlayout": lambda: engine.simulateRandomPlayout(0),
+        "expandNode": expand,
+    }
+    warmup, results = {}, {}
+    for name, function in benchmarks.items():
+        warmup[name] = warm_up(function)
+        results[name] = time_calls(function, calls)
+
+    # Selection needs a root with statistics on its children
+    engine, turn = new_engine(board, position, seed, options)
+    engine.findNextMove(board, turn, position, max_playouts=2000)
+    select = lambda: UCT.findBestNodeWithUCT(engine, 0)
+    warmup["UCT.findBestNodeWithUCT"] = warm_up(select)
+    results["UCT.findBestNodeWithUCT"] = time_calls(select, calls)
+    return warmup, results
+
+
+def kernel_benchmarks(board, position, calls, seed, options):
+    """Per-call timings of the same kernels run in jitted loops, without the Python call overhead."""
+    engine, turn = new_engine(board, position, seed, options)
+    nodes, config, tt = engine.tree.nodes, engine.config, engine.tt
+    seed_rng(seed)
+    row, col = position
+    played = np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int8)
+    cands = find_candidates(board, engine.candidate_distance)
+    benchmarks = {
+        "run_playout": lambda n: repeat_run_playout(board, row, col, turn, config, played, n),
+        "expand_node": lambda n: repeat_expand_node(nodes, board, cands, config, n),
+    }
+    warmup, results = {}, {}
+    for name, function in benchmarks.items():
+        warmup[name] = warm_up(lambda: function(1))
+        results[name] = time_kernel(function, calls)
+
+    # Selection on a root with statistics on its children
+    engine, turn = new_engine(board, position, seed, options)
+    engine.findNextMove(board, turn, position, max_playouts=2000)
+    nodes = engine.tree.nodes
+    select = lambda n: repeat_best_uct_child(nodes, 0, engine.config, engine.tt, n)
+    warmup["best_uct_child"] = warm_up(lambda: select(1))
+    results["best_uct_child"] = time_kernel(select, calls)
+    return warmup, results
+
+
+def search_benchmark(board, position, search_time, seed, options):
+    """Playouts and tree nodes per second of one findNextMove call."""
+    engine, turn = new_engine(board, position, seed, options)
+    engine.early_stop = False
+    start = time.perf_counter()
+    _, _, playouts = engine.findNextMove(board, turn, position, max_time=search_time)
+    seconds = time.perf_counter() - start
+    nodes = len(engine.tree)
+    engine.close()
+    return {"playouts": playouts, "nodes": nodes, "seconds": seconds,
+            "playouts_per_s": playouts / seconds, "nodes_per_s": nodes / seconds}
+
+
+def solver_benchmark(board, position):
+    """What solve finds for the side to move and how long it takes."""
+    turn = int(np.count_nonzero(board)) - 1
+    start = time.perf_counter()
+    solution = solve(board, turn, SOLVER_TIME)
+    return {"status": solution.status, "depth": solution.depth, "positions": solution.nodes,
+            "seconds": time.perf_counter() - start}
+
+
+def run(search_time=2.0, calls=2000, seed=12345, options=None):
+    """Run every benchmark and return the report as a dict."""
+    options = options or {}
+    boards = positions(seed)
+    report = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "numpy": np.__version__, "numba": numba.__version__, "cpu_count": os.cpu_count(),
+                 "seed": seed, "search_time": search_time, "calls": calls, "options": options},
+        "warmup": {},
+        "micro": {},
+        "kernels": {},
+        "search": {},
+        "solver": {},
+    }
+
+    board, position = boards["midgame"]
+    report["warmup"], report["micro"] = micro_benchmarks(board.copy(), position, calls, seed, options)
+    warmup, report["kernels"] = kernel_benchmarks(board.copy(), position, calls, seed, options)
+    report["warmup"].update({"kernel " + name: seconds for name, seconds in warmup.items()})
+
+    # One short search per position compiles whatever the micro benchmarks did not
+    start = time.perf_counter()
+    for board, position in boards.values():
+        engine, turn = new_engine(board, position, seed, options)
+        engine.findNextMove(board, turn, position, max_playouts=200)
+        engine.close()
+    report["warmup"]["findNextMove"] = time.perf_counter() - start
+
+    for name, (board, position) in boards.items():
+        report["search"][name] = search_benchmark(board, position, search_time, seed, options)
+        report["solver"][name] = solver_benchmark(board, position)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--search-time", type=float, default=2.0, help="seconds of each findNextMove run")
+    parser.add_argument("--calls", type=int, default=2000, help="timed calls per micro benchmark")
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--pair-moves", action="store_true")
+    parser.add_argument("--transpositions", action="store_true")
+    parser.add_argument("--heavy-playouts", action="store_true")
+    parser.add_argument("--rave", action="store_true")
+    args = parser.parse_args(argv)
+
+    options = dict(workers=args.workers, threads=args.threads, pair_moves=args.pair_moves,
+                   transpositions=args.transpositions, heavy_playouts=args.heavy_playouts, rave=args.rave)
+    report = run(args.search_time, args.calls, args.seed, options)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
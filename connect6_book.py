@@ -0,0 +1,195 @@
+"""Opening book: the stone to play in positions that keep coming up early in a game.
+
+Positions are keyed by a canonical hash that is the same for all 8
+rotations and mirror images of the board. The smallest of their 8 Zobrist
+hashes is used, and the move is stored in the orientation that gave it. The
+book is an open-addressing hash table saved as one .npy file, which
+OpeningBook maps with mmap_mode="r". A lookup hashes the stones, probes a
+slot or two and turns the move back to the board's orientation.
+
+Books are built offline from game records (see connect6_records), e.g. the
+games connect6_selfplay writes:
+
+    python connect6_book.py build selfplay.c6g book.npy --stones 10 --min-games 3
+"""
+import argparse
+import sys
+
+import numpy as np
+from numba import njit
+
+from connect6_engine import BOARD_SIZE, ZOBRIST, ChildStats, player_for_turn
+from connect6_records import GameRecords
+
+BOOK_STONES = 10  # positions with fewer stones than this go into a book
+BOOK_MIN_GAMES = 2  # times a move must have been played from a position to get into a book
+BOOK_DTYPE = np.dtype([("key", "<u8"), ("move", "<i2"), ("games", "<u4"), ("wins", "<u4")])
+
+
+def build_symmetries():
+    """SYMMETRIES[t, cell]: where the 8 rotations and reflections of the board send a cell."""
+    last = BOARD_SIZE - 1
+    rows, cols = np.divmod(np.arange(BOARD_SIZE * BOARD_SIZE), BOARD_SIZE)
+    images = [(rows, cols), (cols, last - rows), (last - rows, last - cols), (last - cols, rows),
+              (rows, last - cols), (cols, rows), (last - rows, cols), (last - cols, last - rows)]
+    return np.array([r * BOARD_SIZE + c for r, c in images], dtype=np.int64)
+
+
+SYMMETRIES = build_symmetries()
+INVERSE_SYMMETRIES = np.argsort(SYMMETRIES, axis=1)
+
+
+@njit(cache=True)
+def canonical_hash(cells, players):
+    """Smallest of the 8 symmetric Zobrist hashes of the stones (cells, players),
+    and the symmetry t that gives it."""
+    best, best_t = np.uint64(0), 0
+    for t in range(8):
+        key = np.uint64(0)
+        for i in range(cells.size):
+            key ^= ZOBRIST[players[i], SYMMETRIES[t, cells[i]]]
+        if t == 0 or key < best:
+            best, best_t = key, t
+    return best, best_t
+
+
+@njit(cache=True)
+def book_samples(data, starts, counts, stones):
+    """The positions of the records with 1 to stones - 1 stones, as (canonical
+    key, next stone in the key's orientation, its player, game index)."""
+    total = 0
+    for g in range(starts.size):
+        total += max(min(counts[g], stones) - 1, 0)
+    keys = np.empty(total, dtype=np.uint64)
+    moves = np.empty(total, dtype=np.int16)
+    players = np.empty(total, dtype=np.int8)
+    games = np.empty(total, dtype=np.int64)
+    hashes = np.zeros(8, dtype=np.uint64)
+    p = 0
+    for g in range(starts.size):
+        hashes[:] = 0
+        for i in range(min(counts[g], stones)):
+            cell = data[starts[g] + i]
+            player = player_for_turn(i)
+            if i > 0:
+                # Symmetry with the smallest hash, the first one on ties like canonical_hash
+                t = 0
+                for s in range(1, 8):
+                    if hashes[s] < hashes[t]:
+                        t = s
+                keys[p], moves[p], players[p], games[p] = hashes[t], SYMMETRIES[t, cell], player, g
+                p += 1
+            for s in range(8):
+                hashes[s] ^= ZOBRIST[player, SYMMETRIES[s, cell]]
+    return keys, moves, players, games
+
+
+def build_book(records, stones=BOOK_STONES, min_games=BOOK_MIN_GAMES):
+    """The book of a GameRecords: for every position played at least min_games
+    times, the move played most often (the one that won more on ties)."""
+    keys, moves, players, games = book_samples(records.data, records.starts, records.counts, stones)
+    won = records.results[games] == players
+
+    # Games and wins of every (position, move)
+    order = np.lexsort((moves, keys))
+    keys, moves, won = keys[order], moves[order], won[order]
+    first = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]) | (moves[1:] != moves[:-1])])
+    played = np.diff(np.r_[first, len(keys)])
+    wins = np.add.reduceat(won.astype(np.int64), first) if len(first) else np.zeros(0, dtype=np.int64)
+    keys, moves = keys[first], moves[first]
+
+    # The best move of each position
+    order = np.lexsort((-wins, -played, keys))
+    keys, moves, played, wins = keys[order], moves[order], played[order], wins[order]
+    best = np.r_[True, keys[1:] != keys[:-1]] & (played >= min_games)
+
+    entries = np.zeros(int(best.sum()), dtype=BOOK_DTYPE)
+    entries["key"], entries["move"] = keys[best], moves[best]
+    entries["games"], entries["wins"] = played[best], wins[best]
+    return hash_table(entries)
+
+
+def hash_table(entries):
+    """The entries in an open-addressing table of at least twice their number of
+    slots (a power of two), probed linearly from key & (size - 1). Key 0 marks
+    an empty slot; it is the empty board, which is never in a book."""
+    size = 1
+    while size < 2 * len(entries):
+        size *= 2
+    table = np.zeros(size, dtype=BOOK_DTYPE)
+    mask = np.uint64(size - 1)
+    for entry in entries:
+        slot = int(entry["key"] & mask)
+        while table[slot]["key"] != 0:
+            slot = (slot + 1) & (size - 1)
+        table[slot] = entry
+    return table
+
+
+class OpeningBook:
+    """A book table, usually mapped from its .npy file."""
+
+    def __init__(self, table):
+        self.table = table
+        self.keys = table["key"]
+        self.mask = len(table) - 1
+
+    @classmethod
+    def open(cls, path):
+        return cls(np.load(path, mmap_mode="r"))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.keys))
+
+    def probe(self, key):
+        """Slot of `key` in the table, -1 if the book does not have it."""
+        slot = int(key) & self.mask
+        while self.keys[slot] != 0:
+            if self.keys[slot] == key:
+                return slot
+            slot = (slot + 1) & self.mask
+        return -1
+
+    def find_move(self, state):
+        """ChildStats of the book stone for `state` (a GameState) with the games
+        and wins it was built from, None if the position is not in the book."""
+        cells = np.flatnonzero(state.board)
+        if cells.size == 0:
+            return None
+        key, t = canonical_hash(cells, state.board.ravel()[cells].astype(np.int64))
+        slot = self.probe(key)
+        if slot == -1:
+            return None
+        entry = self.table[slot]
+        row, col = divmod(int(INVERSE_SYMMETRIES[t, entry["move"]]), BOARD_SIZE)
+        # A hash collision could point at a stone that is already there
+        if state.board[row, col] != 0:
+            return None
+        return ChildStats((row, col), int(entry["games"]), float(entry["wins"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("build", help="build a book from a game record file")
+    command.add_argument("records")
+    command.add_argument("book")
+    command.add_argument("--stones", type=int, default=BOOK_STONES,
+                         help="book the positions with fewer stones than this")
+    command.add_argument("--min-games", type=int, default=BOOK_MIN_GAMES,
+                         help="times a move must have been played to be booked")
+    command = commands.add_parser("info", help="count the positions of a book")
+    command.add_argument("book")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        table = build_book(GameRecords(args.records), args.stones, args.min_games)
+        np.save(args.book, table)
+        print(f"{np.count_nonzero(table['key'])} positions written to {args.book}")
+    else:
+        book = OpeningBook.open(args.book)
+        print(f"{len(book)} positions in {len(book.table)} slots, {book.table.nbytes} bytes")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2488 @@
+"""Connect6 engine without any GUI: the board kernels, Monte Carlo tree search and game state.
+
+connect6_final.py is the tkinter front end on top of it.
+"""
+import random
+import time
+import numpy as np
+from heapq import nlargest
+from collections import namedtuple
+import math
+import multiprocessing
+import json
+import threading
+
+from numba import njit, types
+from numba.core import cgutils
+from numba.extending import intrinsic
+from numba.core import event
+from llvmlite import ir
+
+BOARD_SIZE = 19
+TREE_CAPACITY = 1_000_000  # nodes preallocated for one search
+ITERATIONS_PER_CALL = 32  # MCTS iterations per jitted call, the deadline is checked in between
+CANDIDATE_DISTANCE = 2  # moves searched are empty cells at most this many rows/columns from a stone
+UNTRIED_PER_NODE = 32  # untried-move pool slots preallocated per tree node, a full midgame tree needs ~26
+PAIR_CANDIDATES = 16  # cells a pair-mode node pairs up, the best ones by pattern_weight
+VIRTUAL_LOSS = 3  # visits a thread adds to the nodes on its path until its playout is backed up
+TT_BYTES = 64 * 1024 * 1024  # memory cap of the transposition table
+PLAYOUT_CUTOFF = 12  # stones a heavy playout plays before it is scored by the static evaluation
+EXPLORATION = 1.41  # UCT exploration constant
+PONDER_SHARE = 0.5  # share of the tree's nodes pondering may fill, the rest is left to the next search
+RAVE_EQUIVALENCE = 1000.0  # visits at which a node's own win rate and its AMAF one weigh the same in RAVE mode
+
+# Zobrist keys: the hash of a board XORs ZOBRIST[player, cell] over its stones
+ZOBRIST = np.random.default_rng(6).integers(1, 2 ** 64 - 1, size=(3, BOARD_SIZE * BOARD_SIZE),
+                                            dtype=np.uint64, endpoint=True)
+directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
+
+
+# @jit(nopython=True)
+@njit(cache = True)
+def perform_random_play(board, current_player):
+    player = player_for_turn(current_player - 1)
+
+    # empty_cells = np.transpose(np.where(board == 0))
+    empty_cells = np.argwhere(board == 0)
+    if empty_cells.size > 0:
+
+        random_index = random.randint(0, empty_cells.shape[0] - 1)
+        random_move = empty_cells[random_index]
+
+        board[random_move[0], random_move[1]] = player
+        return board, random_move
+
+@njit(cache = True)
+def within_bounds(row, col):
+    return (0 <= row < BOARD_SIZE) and (0 <= col < BOARD_SIZE)
+
+@njit(cache=True)
+
+def check_win(row, col, board, playerNum):
+    # This function is now decorated with Numba for optimization
+    directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
+    # opponent = 3 - playerNum
+
+    for dr, dc in directions:
+        count = 1  # Count the current player's stones
+        for offset in range(1, 6):  # Check up to 5 stones in each direction
+            new_row = row + dr * offset
+            new_col = col + dc * offset
+           
+            if within_bounds(new_row,new_col) and  board[new_row, new_col] == playerNum:
+
+                count += 1
+            else:
+                break
+
+        for offset in range(1, 6):
+            new_row = row - dr * offset
+            new_col = col - dc * offset
+            if within_bounds(new_row,new_col) and  board[new_row, new_col] == playerNum:
+                count += 1
+            else:
+                break
+
+        if count >= 6:
+            return playerNum
+    return False
+
+
+@njit(cache=True)
+def seed_rng(seed):
+    # Numba keeps its own random state, separate from NumPy's
+    np.random.seed(seed)
+
+
+@njit(cache=True)
+def player_for_turn(turn):
+    # Connect6 order: black plays 1 stone, then each side plays 2 -> 1 2 2 1 1 2 2 ...
+    if turn % 4 == 0 or turn % 4 == 3:
+        return 1
+    return 2
+
+
+# Bitboards: every row, column and diagonal of a player's stones is one uint64,
+# bit i being the i-th cell along the line (a line never wraps into the next one).
+# lines[player, direction, line] with directions as in `directions`.
+N_LINES = 2 * BOARD_SIZE - 1
+ONE = np.uint64(1)
+
+
+@njit(cache=True)
+def line_index(direction, row, col):
+    if direction == 0:
+        return col
+    if direction == 1:
+        return row
+    if direction == 2:
+        return row - col + BOARD_SIZE - 1
+    return row + col
+
+
+@njit(cache=True)
+def line_bit(direction, row, col):
+    return row if direction == 0 else col
+
+
+@njit(cache=True)
+def new_bitboard():
+    return np.zeros((3, 4, N_LINES), dtype=np.uint64)
+
+
+@njit(cache=True)
+def bitboard_place(lines, player, row, col):
+    for direction in range(4):
+        lines[player, direction, line_index(direction, row, col)] |= ONE << np.uint64(line_bit(direction, row, col))
+
+
+@njit(cache=True)
+def bitboard_from_board(board):
+    lines = new_bitboard()
+    for r in range(BOARD_SIZE):
+        for c in range(BOARD_SIZE):
+            if board[r, c] != 0:
+                bitboard_place(lines, board[r, c], r, c)
+    return lines
+
+
+@njit(cache=True)
+def bitboard_wins(lines, player, row, col):
+    """True if the stone of `player` at (row, col) is part of six or more in a row.
+
+    Same answer as check_win, but each direction is a few shifts and ANDs on
+    one word instead of a walk of up to ten bounds-checked cells.
+    """
+    for direction in range(4):
+        x = lines[player, direction, line_index(direction, row, col)]
+        pairs = x & (x >> ONE)  # bit i set: cells i, i+1 taken
+        fours = pairs & (pairs >> np.uint64(2))
+        sixes = fours & (pairs >> np.uint64(4))
+        bit = line_bit(direction, row, col)
+        # Only runs starting between bit - 5 and bit contain this stone
+        window = ((ONE << np.uint64(bit + 1)) - ONE) & ~((ONE << np.uint64(max(bit - 5, 0))) - ONE)
+        if sixes & window:
+            return True
+    return False
+
+
+@njit(cache=True)
+def simulate_playout(board, row, col, current_player, played):
+    """Play random stones until someone connects six or the board is full.
+
+    (row, col) is the last stone on the board and current_player the turn
+    counter of its node, so the next stone belongs to player_for_turn(current_player).
+    The empty cells are kept in one array: each ply picks a random slot and
+    swap-removes it, so a ply costs O(1) instead of a full board scan, and the
+    stones live in bitboards for the win check. Returns the winner (1 or 2,
+    0 for a draw) and the number of stones played. `board` is not modified;
+    the player of every stone the rollout plays is written to played[cell].
+    """
+    lines = new_bitboard()
+    empty_cells = np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int16)
+    stones = 0
+    n_empty = 0
+    for r in range(BOARD_SIZE):
+        for c in range(BOARD_SIZE):
+            if board[r, c] == 0:
+                empty_cells[n_empty] = r * BOARD_SIZE + c
+                n_empty += 1
+            else:
+                bitboard_place(lines, board[r, c], r, c)
+                stones += 1
+
+    playerNum = board[row, col]
+    if playerNum != 0 and bitboard_wins(lines, playerNum, row, col):
+        return playerNum, 0
+
+    plies = 0
+    while stones < BOARD_SIZE * BOARD_SIZE:
+        i = np.random.randint(n_empty)
+        cell = empty_cells[i]
+        n_empty -= 1
+        empty_cells[i] = empty_cells[n_empty]
+
+        r = cell // BOARD_SIZE
+        c = cell % BOARD_SIZE
+        player = player_for_turn(current_player)
+        bitboard_place(lines, player, r, c)
+        played[cell] = player
+        stones += 1
+        plies += 1
+        current_player += 1
+
+        if bitboard_wins(lines, player, r, c):
+            return player, plies
+    return 0, plies
+
+
+# Six-cell windows: every run of six cells along a row, column or diagonal.
+# A window is "live" for a player while the opponent has no stone in it; a live
+# window holding k stones needs 6 - k more to win. Built once at import.
+def build_windows():
+    windows = []
+    for dr, dc in directions:
+        for r in range(BOARD_SIZE):
+            for c in range(BOARD_SIZE):
+                if 0 <= r + 5 * dr < BOARD_SIZE and 0 <= c + 5 * dc < BOARD_SIZE:
+                    windows.append([(r + i * dr) * BOARD_SIZE + c + i * dc for i in range(6)])
+    window_cells = np.array(windows, dtype=np.int16)
+    cell_windows = np.full((BOARD_SIZE * BOARD_SIZE, 24), -1, dtype=np.int16)
+    cell_window_count = np.zeros(BOARD_SIZE * BOARD_SIZE, dtype=np.int16)
+    for w, cells in enumerate(windows):
+        for cell in cells:
+            cell_windows[cell, cell_window_count[cell]] = w
+            cell_window_count[cell] += 1
+    return window_cells, cell_windows, cell_window_count
+
+
+WINDOW_CELLS, CELL_WINDOWS, CELL_WINDOW_COUNT = build_windows()
+N_WINDOWS = WINDOW_CELLS.shape[0]
+# Static evaluation weight of a live window by the number of stones in it
+WINDOW_WEIGHTS = np.array([0, 1, 8, 64, 512, 4096, 1 << 20], dtype=np.int64)
+# A live window with this many stones can be completed by one two-stone turn
+THREAT_STONES = 4
+# Odds of a heavy-playout move by the stones of one side in a live window through the cell
+PATTERN_WEIGHTS = np.array([0, 1, 4, 16, 64, 256, 0], dtype=np.int64)
+# Heavy playouts sample near this many of the last stones played
+RECENT_STONES = 4
+# Score difference that makes a cut-off heavy playout a 1 : e win for the side ahead
+EVAL_SCALE = 512.0
+
+# counts[w, player]: stones of each player in window w; live[player, k]: number of
+# windows live for player holding k stones; score[player]: sum of WINDOW_WEIGHTS over
+# them; hot/hot_index/hot_size: per player, the set of live windows with at least
+# THREAT_STONES stones, with O(1) add and remove. cells is the flat board.
+WindowTable = namedtuple("WindowTable", ["cells", "counts", "live", "score", "hot", "hot_index", "hot_size"])
+
+
+@njit(cache=True)
+def new_window_table():
+    return WindowTable(np.zeros(BOARD_SIZE * BOARD_SIZE, dtype=np.int8),
+                       np.zeros((N_WINDOWS, 3), dtype=np.int8),
+                       np.zeros((3, 7), dtype=np.int32),
+                       np.zeros(3, dtype=np.int64),
+                       np.zeros((3, N_WINDOWS), dtype=np.int16),
+                       np.full((3, N_WINDOWS), -1, dtype=np.int16),
+                       np.zeros(3, dtype=np.int32))
+
+
+@njit(cache=True)
+def copy_window_table(table):
+    return WindowTable(table.cells.copy(), table.counts.copy(), table.live.copy(), table.score.copy(),
+                       table.hot.copy(), table.hot_index.copy(), table.hot_size.copy())
+
+
+@njit(cache=True)
+def window_account(table, w, sign):
+    # Add (sign 1) or take back (sign -1) what window w contributes to the totals
+    for player in range(1, 3):
+        k = table.counts[w, player]
+        if k == 0 or table.counts[w, 3 - player] != 0:
+            continue
+        table.live[player, k] += sign
+        table.score[player] += sign * WINDOW_WEIGHTS[k]
+        if k >= THREAT_STONES:
+            if sign > 0:
+                table.hot_index[player, w] = table.hot_size[player]
+                table.hot[player, table.hot_size[player]] = w
+                table.hot_size[player] += 1
+            else:
+                i = table.hot_index[player, w]
+                table.hot_size[player] -= 1
+                last = table.hot[player, table.hot_size[player]]
+                table.hot[player, i] = last
+                table.hot_index[player, last] = i
+                table.hot_index[player, w] = -1
+
+
+@njit(cache=True)
+def window_update(table, cell, player, delta):
+    for j in range(CELL_WINDOW_COUNT[cell]):
+        w = CELL_WINDOWS[cell, j]
+        window_account(table, w, -1)
+        table.counts[w, player] += delta
+        window_account(table, w, 1)
+
+
+@njit(cache=True)
+def window_place(table, cell, player):
+    table.cells[cell] = player
+    window_update(table, cell, player, 1)
+
+
+@njit(cache=True)
+def window_remove(table, cell):
+    player = table.cells[cell]
+    table.cells[cell] = 0
+    window_update(table, cell, player, -1)
+
+
+@njit(cache=True)
+def window_table_from_board(board):
+    table = new_window_table()
+    for r in range(BOARD_SIZE):
+        for c in range(BOARD_SIZE):
+            if board[r, c] != 0:
+                window_place(table, r * BOARD_SIZE + c, board[r, c])
+    return table
+
+
+@njit(cache=True)
+def window_can_win(table, player, stones_left):
+    """True if `player` can connect six with `stones_left` more stones (O(1))."""
+    for k in range(max(6 - stones_left, 1), 7):
+        if table.live[player, k] > 0:
+            return True
+    return False
+
+
+@njit(cache=True)
+def window_empty_cells(table, w, out, n):
+    # Appends the empty cells of window w to out[n:], returns the new length
+    for i in range(6):
+        cell = WINDOW_CELLS[w, i]
+        if table.cells[cell] == 0:
+            out[n] = cell
+            n += 1
+    return n
+
+
+@njit(cache=True)
+def window_winning_cells(table, player, stones_left, out):
+    """Writes the empty cells of one window `player` completes with `stones_left`
+    stones to `out` and returns how many there are, or -1 if there is none."""
+    for i in range(table.hot_size[player]):
+        w = table.hot[player, i]
+        if table.counts[w, player] >= 6 - stones_left:
+            return window_empty_cells(table, w, out, 0)
+    return -1
+
+
+@njit(cache=True)
+def window_threat_cells(table, player, out):
+    """Writes to `out` every empty cell of a window the opponent of `player` could
+    complete next turn - the cells `player` must choose from to block - and
+    returns how many there are. Cells are listed once; `out` needs room for the board."""
+    opponent = 3 - player
+    n = 0
+    for i in range(table.hot_size[opponent]):
+        w = table.hot[opponent, i]
+        for j in range(6):
+            cell = WINDOW_CELLS[w, j]
+            if table.cells[cell] != 0:
+                continue
+            seen = False
+            for m in range(n):
+                if out[m] == cell:
+                    seen = True
+                    break
+            if not seen:
+                out[n] = cell
+                n += 1
+    return n
+
+
+@njit(cache=True)
+def window_threats(table, player):
+    """Number of windows the opponent of `player` could complete next turn."""
+    opponent = 3 - player
+    return table.live[opponent, THREAT_STONES] + table.live[opponent, THREAT_STONES + 1]
+
+
+@njit(cache=True)
+def window_score(table, player):
+    """Static evaluation from the point of view of `player`: weighted live windows
+    of `player` minus those of the opponent."""
+    return table.score[player] - table.score[3 - player]
+
+
+@njit(cache=True)
+def block_cell(table, player, out, n):
+    # Of the n cells in out that block the opponent, the one in the most of its threat windows
+    opponent = 3 - player
+    best = out[0]
+    best_count = -1
+    for i in range(n):
+        cell = out[i]
+        count = 0
+        for j in range(CELL_WINDOW_COUNT[cell]):
+            if table.hot_index[opponent, CELL_WINDOWS[cell, j]] != -1:
+                count += 1
+        if count > best_count:
+            best = cell
+            best_count = count
+    return best
+
+
+@njit(cache=True)
+def pattern_weight(table, player, cell):
+    # A cell is worth more the more stones of one side share a live window with it:
+    # those are the windows a stone there builds (own) or spoils (opponent's)
+    weight = 1
+    for j in range(CELL_WINDOW_COUNT[cell]):
+        w = CELL_WINDOWS[cell, j]
+        own = table.counts[w, player]
+        other = table.counts[w, 3 - player]
+        if other == 0:
+            weight += PATTERN_WEIGHTS[own]
+        elif own == 0:
+            weight += PATTERN_WEIGHTS[other]
+    return weight
+
+
+@njit(cache=True)
+def heavy_playout(board, row, col, current_player, cutoff, played):
+    """Rollout that plays like a (weak) player instead of at random.
+
+    Every stone takes an immediate win if there is one, otherwise blocks the
+    opponent's, otherwise is drawn near the last RECENT_STONES stones with
+    pattern_weight as its odds. After `cutoff` stones (0: no limit) the rollout
+    stops and the winner is drawn from the static evaluation. Same arguments
+    and result as simulate_playout. `played` gets every stone placed, and on
+    a win the cells that complete the six; a cut-off rollout credits only the
+    stones it played, since the evaluation puts down none.
+    """
+    table = window_table_from_board(board)
+    playerNum = board[row, col]
+    if playerNum != 0 and window_can_win(table, playerNum, 0):
+        return playerNum, 0
+
+    n_cells = BOARD_SIZE * BOARD_SIZE
+    empty_cells = np.empty(n_cells, dtype=np.int16)
+    empty_index = np.full(n_cells, -1, dtype=np.int16)
+    n_empty = 0
+    for cell in range(n_cells):
+        if table.cells[cell] == 0:
+            empty_index[cell] = n_empty
+            empty_cells[n_empty] = cell
+            n_empty += 1
+
+    recent = np.full(RECENT_STONES, -1, dtype=np.int16)
+    recent[0] = row * BOARD_SIZE + col
+    n_recent = 1
+    out = np.empty(n_cells, dtype=np.int16)
+    weights = np.empty(n_cells, dtype=np.int64)
+    seen = np.zeros(n_cells, dtype=np.int32)
+
+    plies = 0
+    while n_empty > 0:
+        player = player_for_turn(current_player)
+        stones_left = 1 if player_for_turn(current_player + 1) != player else 2
+        if window_can_win(table, player, stones_left):
+            # The winning stones are not placed, but AMAF needs to see them
+            n = window_winning_cells(table, player, stones_left, out)
+            for i in range(n):
+                played[out[i]] = player
+            return player, plies + stones_left
+        if cutoff > 0 and plies >= cutoff:
+            p = 1.0 / (1.0 + math.exp(-window_score(table, player) / EVAL_SCALE))
+            return (player if np.random.random() < p else 3 - player), plies
+
+        n = window_threat_cells(table, player, out)
+        if n > 0:
+            cell = block_cell(table, player, out, n)
+        else:
+            # Empty cells around the recent stones, each listed once
+            n = 0
+            total = 0
+            for i in range(min(n_recent, RECENT_STONES)):
+                r0 = recent[i] // BOARD_SIZE
+                c0 = recent[i] % BOARD_SIZE
+                for r in range(max(r0 - 2, 0), min(r0 + 3, BOARD_SIZE)):
+                    for c in range(max(c0 - 2, 0), min(c0 + 3, BOARD_SIZE)):
+                        cell = r * BOARD_SIZE + c
+                        if table.cells[cell] == 0 and seen[cell] != plies + 1:
+                            seen[cell] = plies + 1
+                            out[n] = cell
+                            total += pattern_weight(table, player, cell)
+                            weights[n] = total
+                            n += 1
+            if n > 0:
+                pick = np.random.randint(total)
+                i = 0
+                while weights[i] <= pick:
+                    i += 1
+                cell = out[i]
+            else:
+                cell = empty_cells[np.random.randint(n_empty)]
+
+        i = empty_index[cell]
+        n_empty -= 1
+        last = empty_cells[n_empty]
+        empty_cells[i] = last
+        empty_index[last] = i
+        window_place(table, cell, player)
+        played[cell] = player
+        recent[n_recent % RECENT_STONES] = cell
+        n_recent += 1
+        current_player += 1
+        plies += 1
+    return 0, plies
+
+
+@njit(cache=True)
+def run_playout(board, row, col, current_player, config, played):
+    """The rollout selected by config: heavy_playout or simulate_playout, returns (winner, stones played)."""
+    if config.heavy_playouts:
+        return heavy_playout(board, row, col, current_player, config.playout_cutoff, played)
+    return simulate_playout(board, row, col, current_player, played)
+
+
+class WindowBoard:
+    """Board kept together with its six-cell window counts.
+
+    Placing or removing a stone touches only the (at most 24) windows through its
+    cell; after that the win, block and evaluation queries are O(1) or bounded
+    by the handful of windows that are one turn from completion.
+    """
+
+    def __init__(self, board=None):
+        if board is None:
+            self.table = new_window_table()
+        else:
+            self.table = window_table_from_board(np.asarray(board, dtype=np.int8))
+
+    def place(self, row, col, player):
+        window_place(self.table, row * BOARD_SIZE + col, player)
+
+    def remove(self, row, col):
+        window_remove(self.table, row * BOARD_SIZE + col)
+
+    def immediate_win(self, player, stones_left=2):
+        """The cells that connect six for `player` with `stones_left` stones, or None."""
+        out = np.empty(6, dtype=np.int16)
+        n = window_winning_cells(self.table, player, stones_left, out)
+        if n < 0:
+            return None
+        return [divmod(int(cell), BOARD_SIZE) for cell in out[:n]]
+
+    def must_block(self, player):
+        """Cells `player` has to pick from so the opponent can't win on its next turn."""
+        out = np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int16)
+        n = window_threat_cells(self.table, player, out)
+        return [divmod(int(cell), BOARD_SIZE) for cell in out[:n]]
+
+    def evaluate(self, player):
+        return int(window_score(self.table, player))
+
+
+# Threat-space solver. It proves wins by continuous double threats: every turn
+# the attacker blocks whatever the defender threatens and leaves windows one
+# turn from six that the defender needs both stones to block, until they need
+# three. The defender's replies are then every blocking pair, so a proof holds
+# against any defence.
+SOLVER_TIME = 0.1  # seconds findNextMove lets the threat solver run before the tree search
+SOLVER_DEPTH = 6  # attacking turns the threat solver looks ahead at most
+SOLVER_TT_SIZE = 1 << 16  # positions the solver's transposition table remembers
+SOLVE_LOSS = -1  # the opponent wins next turn whatever the player does
+SOLVE_UNKNOWN = 0
+SOLVE_WIN = 1  # cells start a forced win
+SOLVE_DEFEND = 2  # cells are the only way to stop the opponent winning next turn
+
+# Proven results of attacker positions by Zobrist key: result 1 is a win, 0 no
+# win within `depth` attacking turns
+SolverTable = namedtuple("SolverTable", ["keys", "depth", "result"])
+
+# What solve found: one of the SOLVE_* values, the (row, col) stones to play
+# (one or two), the depth searched and the positions visited
+Solution = namedtuple("Solution", ["status", "cells", "depth", "nodes"])
+
+
+@njit(cache=True)
+def new_solver_table(size):
+    return SolverTable(np.zeros(size, dtype=np.uint64), np.zeros(size, dtype=np.int8),
+                       np.zeros(size, dtype=np.int8))
+
+
+@njit(cache=True)
+def blocks_needed(table, player, out):
+    """Stones the opponent of `player` needs to spoil every window `player` could
+    complete next turn: 0, 1, 2, or 3 for more than two."""
+    if table.hot_size[player] == 0:
+        return 0
+    opponent = 3 - player
+    n = window_threat_cells(table, opponent, out)
+    for i in range(n):
+        window_place(table, out[i], opponent)
+        blocked = table.hot_size[player] == 0
+        window_remove(table, out[i])
+        if blocked:
+            return 1
+    for i in range(n):
+        window_place(table, out[i], opponent)
+        for j in range(i + 1, n):
+            window_place(table, out[j], opponent)
+            blocked = table.hot_size[player] == 0
+            window_remove(table, out[j])
+            if blocked:
+                window_remove(table, out[i])
+                return 2
+        window_remove(table, out[i])
+    return 3
+
+
+@njit(cache=True)
+def attack_cells(table, attacker, stones_left, out):
+    """Cells worth an attacking stone: the empty cells of the attacker's live
+    windows that `stones_left` stones make a threat, and of the defender's
+    threats, which the attacker must block. Returns how many there are."""
+    defender = 3 - attacker
+    seen = np.zeros(BOARD_SIZE * BOARD_SIZE, dtype=np.bool_)
+    n = 0
+    for w in range(N_WINDOWS):
+        mine, theirs = table.counts[w, attacker], table.counts[w, defender]
+        if (theirs == 0 and mine >= THREAT_STONES - stones_left) or (mine == 0 and theirs >= THREAT_STONES):
+            for i in range(6):
+                cell = WINDOW_CELLS[w, i]
+                if table.cells[cell] == 0 and not seen[cell]:
+                    seen[cell] = True
+                    out[n] = cell
+                    n += 1
+    return n
+
+
+@njit(cache=True)
+def solve_attack(table, attacker, stones_left, key, depth, tt, budget, move):
+    """1 if `attacker`, to place `stones_left` stones, wins by continuous double
+    threats within `depth` turns, else 0; the first winning stones go to move
+    (-1 for none). budget is [positions visited, limit, aborted]: every
+    attacking move tried is a position, and once the limit is passed
+    everything returns 0 and nothing more is stored."""
+    move[:] = -1
+    if window_can_win(table, attacker, stones_left):
+        return 1
+    if depth == 0 or budget[2]:
+        return 0
+    slot = key & np.uint64(tt.keys.size - 1)
+    if tt.keys[slot] == key and (tt.result[slot] == 1 or tt.depth[slot] >= depth):
+        return tt.result[slot]
+
+    defender = 3 - attacker
+    out = np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int16)
+    blocks = np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int16)
+    reply = np.empty(2, dtype=np.int64)
+    n = attack_cells(table, attacker, stones_left, out)
+    result = 0
+    for i in range(n):
+        window_place(table, out[i], attacker)
+        # One stone left: only out[i] (j == i), otherwise out[i] with every later out[j]
+        for j in range(i if stones_left == 1 else i + 1, i + 1 if stones_left == 1 else n):
+            budget[0] += 1
+            if budget[0] > budget[1]:
+                budget[2] = 1
+                break
+            if j != i:
+                window_place(table, out[j], attacker)
+            child = key ^ ZOBRIST[attacker, out[i]]
+            if j != i:
+                child ^= ZOBRIST[attacker, out[j]]
+            # A move that leaves the defender a win, or a threat one stone blocks, proves nothing
+            result = 0
+            if table.hot_size[defender] == 0:
+                need = blocks_needed(table, attacker, blocks)
+                if need >= 3:
+                    result = 1
+                elif need == 2:
+                    # Every pair that blocks all the threats has to lose
+                    result = 1
+                    m = window_threat_cells(table, defender, blocks)
+                    for a in range(m):
+                        window_place(table, blocks[a], defender)
+                        for b in range(a + 1, m):
+                            window_place(table, blocks[b], defender)
+                            if table.hot_size[attacker] == 0:
+                                # np.int64(2), not a literal 2: that would compile a second
+                                # version of this function, which crashes when loaded from the cache
+                                result = solve_attack(table, attacker, np.int64(2),
+                                                      child ^ ZOBRIST[defender, blocks[a]] ^ ZOBRIST[defender, blocks[b]],
+                                                      depth - 1, tt, budget, reply)
+                            window_remove(table, blocks[b])
+                            if result == 0:
+                                break
+                        window_remove(table, blocks[a])
+                        if result == 0:
+                            break
+            if j != i:
+                window_remove(table, out[j])
+            if result == 1:
+                move[0], move[1] = out[i], (out[j] if j != i else -1)
+                break
+        window_remove(table, out[i])
+        if result == 1 or budget[2]:
+            break
+    if not budget[2]:
+        tt.keys[slot], tt.depth[slot], tt.result[slot] = key, depth, result
+    return result
+
+
+@njit(cache=True)
+def forced_defence(table, player, stones_left, move):
+    """How many ways `player` has to stop every opponent window it could complete
+    next turn with `stones_left` stones; the first is written to move. 0 when
+    the opponent has no such window (move is left as it is), -1 when they
+    can't all be stopped, 2 for two or more."""
+    opponent = 3 - player
+    if table.hot_size[opponent] == 0:
+        return 0
+    out = np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int16)
+    n = window_threat_cells(table, player, out)
+    found = 0
+    for i in range(n):
+        window_place(table, out[i], player)
+        if table.hot_size[opponent] == 0:
+            if stones_left == 2:
+                # The second stone is free, so there is more than one way
+                window_remove(table, out[i])
+                move[0], move[1] = out[i], -1
+                return 2
+            found += 1
+            move[0], move[1] = out[i], -1
+        elif stones_left == 2:
+            for j in range(i + 1, n):
+                window_place(table, out[j], player)
+                if table.hot_size[opponent] == 0:
+                    found += 1
+                    move[0], move[1] = out[i], out[j]
+                window_remove(table, out[j])
+        window_remove(table, out[i])
+    return min(found, 2) if found > 0 else -1
+
+
+def solve(board, turn, max_time=SOLVER_TIME, max_depth=SOLVER_DEPTH):
+    """Look for a forced result for the player of stone turn + 1 on `board`,
+    where `turn` is the index of the last stone (findNextMove's playerNo).
+
+    Finds an immediate win, a defence that is the only way to survive the
+    opponent's next turn, or a win by continuous double threats, deepening
+    one attacking turn at a time until max_depth or max_time seconds. Returns
+    a Solution; its cells are the whole turn of stones left to place.
+    """
+    start = time.time()
+    board = np.asarray(board, dtype=np.int8)
+    player = player_for_turn(turn + 1)
+    stones_left = 1 if player_for_turn(turn + 2) != player else 2
+    table = window_table_from_board(board)
+    move = np.full(2, -1, dtype=np.int64)
+
+    def solution(status, depth=0, nodes=0):
+        cells = [divmod(int(cell), BOARD_SIZE) for cell in move if cell != -1]
+        return Solution(status, cells, depth, nodes)
+
+    out = np.empty(6, dtype=np.int16)
+    n = window_winning_cells(table, player, stones_left, out)
+    if n >= 0:
+        move[:n] = out[:n]
+        return solution(SOLVE_WIN)
+    defences = forced_defence(table, player, stones_left, move)
+    if defences == -1:
+        return solution(SOLVE_LOSS)
+    if defences == 1:
+        return solution(SOLVE_DEFEND)
+
+    tt = new_solver_table(SOLVER_TT_SIZE)
+    # board_hash comes back as a Python int; one fixed type keeps solve_attack to one compiled version
+    key = np.uint64(board_hash(board))
+    # Positions per deepening step: a guess at first (about a million a second), then from the rate so far
+    budget = np.array([0, max(min(2000, int(max_time * 1e6)), 1), 0], dtype=np.int64)
+    nodes = 0
+    for depth in range(1, max_depth + 1):
+        budget[0], budget[2] = 0, 0
+        step = time.time()
+        found = solve_attack(table, player, stones_left, key, depth, tt, budget, move)
+        nodes += int(budget[0])
+        if found:
+            return solution(SOLVE_WIN, depth, nodes)
+        now = time.time()
+        if now - start >= max_time:
+            break
+        rate = budget[0] / max(now - step, 1e-6)
+        budget[1] = max(int(rate * (start + max_time - now)), 1)
+    move[:] = -1
+    return solution(SOLVE_UNKNOWN, depth, nodes)
+
+
+# Names the GUI and the moves.txt files use for the players
+COLORS = {1: "black", 2: "red"}
+PLAYERS = {"black": 1, "red": 2}
+
+
+# One entry of a game's move log: the cell (row * BOARD_SIZE + col), the
+# player, and 0/1 for the first/second stone of that player's turn
+MOVE_DTYPE = np.dtype([("cell", np.int16), ("player", np.int8), ("phase", np.int8)])
+
+
+class GameState:
+    """A game without any GUI: an int8 board (0 empty, 1 black, 2 red) and a
+    log of the stones in the order they were played.
+
+    Black opens with one stone, then each side plays two (see player_for_turn).
+    `ply` stones of the log are on the board; the ones after it were taken
+    back and can be replayed with redo until a different stone is played.
+    Every step is O(1), so jump can scrub to any ply. `turn` is the index of
+    the last stone on the board, the turn counter the engine works with.
+    """
+
+    def __init__(self, moves=()):
+        self.board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+        self.log = np.zeros(BOARD_SIZE * BOARD_SIZE, dtype=MOVE_DTYPE)
+        self.ply = 0
+        self.length = 0  # entries of the log, the undone ones included
+        self.winner = 0
+        for row, col in moves:
+            self.play(row, col)
+
+    def __len__(self):
+        return self.ply
+
+    @property
+    def moves(self):
+        """(row, col) of the stones on the board, in play order."""
+        return [divmod(int(cell), BOARD_SIZE) for cell in self.log["cell"][:self.ply]]
+
+    @property
+    def turn(self):
+        return self.ply - 1
+
+    @property
+    def last_move(self):
+        return divmod(int(self.log[self.ply - 1]["cell"]), BOARD_SIZE) if self.ply else None
+
+    def to_move(self):
+        """The player who plays the next stone."""
+        return player_for_turn(self.ply)
+
+    def stones_left(self):
+        """Stones the player to move still places this turn, 1 or 2."""
+        return 1 if player_for_turn(self.ply + 1) != self.to_move() else 2
+
+    def is_legal(self, row, col):
+        return (self.winner == 0 and 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE
+                and self.board[row, col] == 0)
+
+    def legal_moves(self):
+        """(row, col) array of the empty cells, empty once the game is over."""
+        if self.status() != -1:
+            return np.empty((0, 2), dtype=np.intp)
+        return np.argwhere(self.board == 0)
+
+    def play(self, row, col):
+        """Place the next stone at (row, col), return the player it belongs to.
+
+        Playing the stone redo would replay keeps the rest of the undone moves,
+        any other stone drops them.
+        """
+        if not self.is_legal(row, col):
+            raise ValueError(f"illegal move {(row, col)}")
+        cell = row * BOARD_SIZE + col
+        if self.ply == self.length or self.log[self.ply]["cell"] != cell:
+            player = self.to_move()
+            phase = int(self.ply > 0 and player_for_turn(self.ply - 1) == player)
+            self.log[self.ply] = (cell, player, phase)
+            self.length = self.ply + 1
+        return self.apply()
+
+    def apply(self):
+        # Puts log[ply] on the board
+        cell, player, _ = self.log[self.ply]
+        row, col = divmod(int(cell), BOARD_SIZE)
+        self.board[row, col] = player
+        self.ply += 1
+        if check_win(row, col, self.board, player):
+            self.winner = int(player)
+        return int(player)
+
+    def undo(self):
+        """Take back the last stone and return its (row, col)."""
+        if self.ply == 0:
+            raise IndexError("no stone to undo")
+        self.ply -= 1
+        row, col = divmod(int(self.log[self.ply]["cell"]), BOARD_SIZE)
+        won = self.winner and check_win(row, col, self.board, self.winner)
+        self.board[row, col] = 0
+        # Play stops at the first six, so normally the stone just removed is the one
+        # that won; a save loaded out of play order can hold its six anywhere
+        self.winner = 0 if won or not self.winner else self.six_owner()
+        return row, col
+
+    def redo(self):
+        """Replay the last stone taken back and return its (row, col)."""
+        if self.ply == self.length:
+            raise IndexError("no stone to redo")
+        self.apply()
+        return self.last_move
+
+    def jump(self, ply):
+        """Undo or redo until `ply` stones of the log are on the board."""
+        if not 0 <= ply <= self.length:
+            raise IndexError(f"ply {ply} is outside the log (0 to {self.length})")
+        while self.ply > ply:
+            self.undo()
+        while self.ply < ply:
+            self.apply()
+
+    def status(self):
+        """The winner (1 or 2), 0 for a draw on a full board, -1 while the game goes on."""
+        if self.winner:
+            return self.winner
+        if self.ply == BOARD_SIZE * BOARD_SIZE:
+            return 0
+        return -1
+
+    def six_owner(self):
+        """Player of a six on the board, looked for from the last stone back; 0 if there is none."""
+        for row, col in reversed(self.moves):
+            if check_win(row, col, self.board, self.board[row, col]):
+                return int(self.board[row, col])
+        return 0
+
+    def winning_line(self):
+        """The cells of the six (or more) in a row that ended the game, [] if none did.
+
+        That is the line through the last stone, or in a save loaded out of
+        play order the one through the latest stone of the winner in a six.
+        """
+        if not self.winner:
+            return []
+        for row, col in reversed(self.moves):
+            if self.board[row, col] != self.winner:
+                continue
+            for dr, dc in directions:
+                line = [(row, col)]
+                for sign in (1, -1):
+                    r, c = row + sign * dr, col + sign * dc
+                    while 0 <= r < BOARD_SIZE and 0 <= c < BOARD_SIZE and self.board[r, c] == self.winner:
+                        line.append((r, c))
+                        r, c = r + sign * dr, c + sign * dc
+                if len(line) >= 6:
+                    return line
+        return []
+
+    def copy(self):
+        state = GameState()
+        state.board = self.board.copy()
+        state.log = self.log.copy()
+        state.ply = self.ply
+        state.length = self.length
+        state.winner = self.winner
+        return state
+
+    def save(self, path):
+        """Write the stones as "row col color" lines, in the order they were played."""
+        with open(path, "w") as file:
+            for cell, player, _ in self.log[:self.ply]:
+                row, col = divmod(int(cell), BOARD_SIZE)
+                file.write(f"{row} {col} {COLORS[int(player)]}\n")
+
+    @classmethod
+    def load(cls, path):
+        """Read a file of "row col color" lines.
+
+        The lines need not be in play order (older saves list the board row by
+        row): the stones of each color are replayed in file order on that
+        color's turns. That order can complete a six before the last stone, so
+        the winner is only looked for once every stone is down. Raises
+        ValueError if the colors don't fit the turn order or a stone can't be
+        played.
+        """
+        stones = {1: [], 2: []}
+        with open(path) as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] in PLAYERS:
+                    stones[PLAYERS[parts[2]]].append((int(parts[0]), int(parts[1])))
+        state = cls()
+        total = len(stones[1]) + len(stones[2])
+        blacks = sum(player_for_turn(turn) == 1 for turn in range(total))
+        if blacks != len(stones[1]):
+            raise ValueError(f"{len(stones[1])} black and {len(stones[2])} red stones do not fit the turn order")
+        index = {1: 0, 2: 0}
+        for turn in range(total):
+            player = player_for_turn(turn)
+            state.play(*stones[player][index[player]])
+            index[player] += 1
+            state.winner = 0
+        state.winner = state.six_owner()
+        return state
+
+
+TreeArrays = namedtuple("TreeArrays", ["parent", "first_child", "next_sibling", "n_children",
+                                       "move", "move2", "hash", "visits", "wins", "player_turn", "size",
+                                       "untried", "untried_start", "untried_size", "untried_count",
+                                       "pair_children", "pool_size", "amaf_visits", "amaf_wins"])
+
+# Empty cells near the stones of a board, kept as a set that supports O(1) add and remove
+Candidates = namedtuple("Candidates", ["cells", "index", "count"])
+
+# Visit and win counts per Zobrist hash, shared by every node of the same position.
+# Buckets are two slots (i, i ^ 1); `age` is the search generation that last touched a slot.
+TranspositionTable = namedtuple("TranspositionTable", ["keys", "visits", "wins", "age", "generation"])
+
+# Scalar search settings handed to the jitted kernels
+SearchConfig = namedtuple("SearchConfig", ["distance", "pair_moves", "transpositions", "virtual_loss",
+                                           "heavy_playouts", "playout_cutoff", "exploration", "instrument",
+                                           "rave", "rave_equivalence"])
+
+# Slots of the float64 array run_iterations counts into when instrumenting;
+# the _CYCLES ones add up cycle_counter() ticks
+STAT_ITERATIONS = 0
+STAT_SELECT_DEPTH = 1
+STAT_SELECT_DEPTH_MAX = 2
+STAT_SELECT_CYCLES = 3
+STAT_EXPANSIONS = 4
+STAT_EXPAND_CYCLES = 5
+STAT_ROLLOUTS = 6
+STAT_ROLLOUT_PLIES = 7
+STAT_ROLLOUT_CYCLES = 8
+STAT_BACKPROP_CYCLES = 9
+N_STATS = 10
+
+
+class Tree:
+    """Search tree stored in preallocated arrays indexed by node id.
+
+    Node 0 is the root. The children of a node form a linked list through
+    first_child / next_sibling, and -1 means "no node". Only the root board is
+    kept: the board of any other node is rebuilt by replaying the moves on its
+    path from the root, so a node costs a few dozen bytes and nothing is
+    allocated while searching.
+
+    The moves a node has not tried yet live in a shared pool: `untried_size`
+    cells starting at `untried_start`, which is -1 until the node is first
+    expanded. In pair mode a node whose side plays the next two stones has
+    pair_children set: each child is a whole turn (move and move2), and its
+    untried moves are the pairs of the PAIR_CANDIDATES best of those cells
+    (see fill_untried). Otherwise move2 is -1.
+    """
+
+    def __init__(self, capacity=TREE_CAPACITY, pool_capacity=None):
+        if pool_capacity is None:
+            pool_capacity = capacity * UNTRIED_PER_NODE
+        self.nodes = TreeArrays(
+            parent=np.empty(capacity, dtype=np.int32),
+            first_child=np.empty(capacity, dtype=np.int32),
+            next_sibling=np.empty(capacity, dtype=np.int32),
+            n_children=np.empty(capacity, dtype=np.int32),
+            move=np.empty(capacity, dtype=np.int16),
+            move2=np.empty(capacity, dtype=np.int16),
+            hash=np.empty(capacity, dtype=np.uint64),
+            visits=np.empty(capacity, dtype=np.int32),
+            wins=np.empty(capacity, dtype=np.float64),
+            player_turn=np.empty(capacity, dtype=np.int32),
+            size=np.zeros(1, dtype=np.int32),
+            untried=np.empty(pool_capacity, dtype=np.int16),
+            untried_start=np.empty(capacity, dtype=np.int32),
+            untried_size=np.empty(capacity, dtype=np.int32),
+            untried_count=np.empty(capacity, dtype=np.int32),
+            pair_children=np.empty(capacity, dtype=np.int8),
+            pool_size=np.zeros(1, dtype=np.int32),
+            amaf_visits=np.empty(capacity, dtype=np.int32),
+            amaf_wins=np.empty(capacity, dtype=np.float64),
+        )
+        self.root_board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+        self.new_id = np.empty(capacity, dtype=np.int32)  # scratch space for compact_subtree
+        self.pending = -1  # first stone of a turn whose root children are pairs
+
+    def __len__(self):
+        return int(self.nodes.size[0])
+
+    def clear(self, cell, cell2, current_player):
+        self.nodes.size[0] = 0
+        self.nodes.pool_size[0] = 0
+        self.pending = -1
+        new_node(self.nodes, -1, cell, cell2, current_player)
+        self.nodes.hash[0] = board_hash(self.root_board)
+
+    def set_root(self, board, position, current_player):
+        """Drop every node and start a new tree at `board`, whose last stone is `position`."""
+        self.root_board[:] = board
+        self.clear(position[0] * BOARD_SIZE + position[1], -1, current_player)
+
+    def matches(self, board, current_player):
+        """True if the root already stands for `board` with `current_player` to search."""
+        return (len(self) > 0 and self.pending == -1 and self.nodes.player_turn[0] == current_player
+                and np.array_equal(self.root_board, board))
+
+    def advance(self, row, col):
+        """Play (row, col) from the root and keep the statistics of the matching subtree.
+
+        When the root's children are stone pairs the first stone is only
+        remembered, and the root moves once the second one arrives.
+        """
+        if len(self) == 0:
+            return
+        current_player = int(self.nodes.player_turn[0])
+        cell = row * BOARD_SIZE + col
+        if self.pending != -1:
+            first, second = min(self.pending, cell), max(self.pending, cell)
+            self.root_board[row, col] = player_for_turn(current_player + 1)
+            for child in self.children(0):
+                if self.nodes.move[child] == first and self.nodes.move2[child] == second:
+                    compact_subtree(self.nodes, child, self.new_id)
+                    self.pending = -1
+                    return
+            self.clear(first, second, current_player + 2)
+            return
+
+        self.root_board[row, col] = player_for_turn(current_player)
+        if self.nodes.pair_children[0] == 1 and self.nodes.untried_start[0] >= 0:
+            self.pending = cell
+            return
+        for child in self.children(0):
+            if self.nodes.move[child] == cell:
+                compact_subtree(self.nodes, child, self.new_id)
+                return
+        # Move was never searched: start over from the new position
+        self.clear(cell, -1, current_player + 1)
+
+    def children(self, node):
+        child = self.nodes.first_child[node]
+        while child != -1:
+            yield child
+            child = self.nodes.next_sibling[child]
+
+    def position(self, node):
+        cell = int(self.nodes.move[node])
+        return cell // BOARD_SIZE, cell % BOARD_SIZE
+
+    def board(self, node):
+        return node_board(self.nodes, self.root_board, node)
+
+    def root_stats(self):
+        """Move keys (see move_key), visit counts and win scores of the root's children, as arrays."""
+        children = list(self.children(0))
+        return (move_key(self.nodes.move[children], self.nodes.move2[children]),
+                self.nodes.visits[children].astype(np.int64), self.nodes.wins[children].copy())
+
+    def full(self):
+        return tree_full(self.nodes)
+
+    def reclaim(self):
+        """Free the pool slots of moves already handed out (see compact_pool).
+        Returns False if that leaves the pool more than 7/8 full, too little
+        to be worth searching on."""
+        compact_pool(self.nodes)
+        return 8 * int(self.nodes.pool_size[0]) <= 7 * self.nodes.untried.shape[0]
+
+    def bytes_per_node(self):
+        """Memory a node takes: one entry of every per-node array plus its share of the pool."""
+        capacity = self.nodes.parent.shape[0]
+        per_node = sum(a.itemsize for a in self.nodes if a.shape[0] == capacity) + self.new_id.itemsize
+        return per_node + self.nodes.untried.nbytes / capacity
+
+
+class ChildStats:
+    """Statistics of one root move, as returned by findNextMove.
+
+    position2 is the second stone of a pair move, None for a single stone.
+    """
+
+    def __init__(self, position, visitCount, winScore, position2=None):
+        self.position = position
+        self.position2 = position2
+        self.visitCount = visitCount
+        self.winScore = winScore
+
+
+def new_transposition_table(n_bytes):
+    """Largest power-of-two table that fits in `n_bytes` (at least one bucket)."""
+    entry_bytes = 8 + 4 + 8 + 4
+    size = 2
+    while size * 2 * entry_bytes <= n_bytes:
+        size *= 2
+    return TranspositionTable(keys=np.zeros(size, dtype=np.uint64), visits=np.zeros(size, dtype=np.int32),
+                              wins=np.zeros(size, dtype=np.float64), age=np.zeros(size, dtype=np.int32),
+                              generation=np.zeros(1, dtype=np.int32))
+
+
+def move_key(move, move2):
+    """One integer per move, single stone or pair (move2 == -1 for a single stone)."""
+    return np.asarray(move, dtype=np.int64) * (BOARD_SIZE * BOARD_SIZE + 1) + np.asarray(move2, dtype=np.int64) + 1
+
+
+def visits_per_cell(moves, visits):
+    """Root visits spread over the board: a float64 array of BOARD_SIZE ** 2 cells,
+    where a pair move (see move_key) counts for both of its stones."""
+    cells, cells2 = np.divmod(np.asarray(moves, dtype=np.int64), BOARD_SIZE * BOARD_SIZE + 1)
+    counts = np.bincount(cells, weights=visits, minlength=BOARD_SIZE * BOARD_SIZE).astype(np.float64)
+    pairs = cells2 > 0
+    counts += np.bincount(cells2[pairs] - 1, weights=visits[pairs], minlength=BOARD_SIZE * BOARD_SIZE)
+    return counts
+
+
+@njit(cache=True)
+def new_node(nodes, parent, cell, cell2, current_player):
+    node = nodes.size[0]
+    if node == nodes.parent.shape[0]:
+        return -1  # tree is full
+    nodes.size[0] = node + 1
+
+    nodes.parent[node] = parent
+    nodes.first_child[node] = -1
+    nodes.next_sibling[node] = -1
+    nodes.n_children[node] = 0
+    nodes.move[node] = cell
+    nodes.move2[node] = cell2
+    nodes.hash[node] = child_hash(nodes, parent, cell, cell2, current_player)
+    nodes.visits[node] = 0
+    nodes.wins[node] = 0.0
+    nodes.amaf_visits[node] = 0
+    nodes.amaf_wins[node] = 0.0
+    nodes.player_turn[node] = current_player
+    nodes.untried_start[node] = -1
+    nodes.untried_count[node] = 0
+    if parent != -1:
+        nodes.next_sibling[node] = nodes.first_child[parent]
+        nodes.first_child[parent] = node
+        nodes.n_children[parent] += 1
+    return node
+
+
+@njit(cache=True)
+def board_hash(board):
+    key = np.uint64(0)
+    for r in range(BOARD_SIZE):
+        for c in range(BOARD_SIZE):
+            if board[r, c] != 0:
+                key ^= ZOBRIST[board[r, c], r * BOARD_SIZE + c]
+    return key
+
+
+@njit(cache=True)
+def child_hash(nodes, parent, cell, cell2, current_player):
+    """Hash of the parent's board plus the child's stones, updated incrementally."""
+    if parent == -1:
+        return np.uint64(0)  # the caller hashes the root board
+    player = player_for_turn(current_player - 1)
+    key = nodes.hash[parent] ^ ZOBRIST[player, cell]
+    if cell2 != -1:
+        key ^= ZOBRIST[player, cell2]
+    return key
+
+
+@njit(cache=True)
+def tt_slot(tt, key, insert):
+    """Slot of `key` in the table, or -1. With insert, a missing key takes over the
+    bucket slot from an older search, or else the one with fewer visits."""
+    if key == 0:
+        return -1
+    i = np.int64(key & np.uint64(tt.keys.shape[0] - 1))
+    j = i ^ 1
+    if tt.keys[i] == key:
+        return i
+    if tt.keys[j] == key:
+        return j
+    if not insert:
+        return -1
+
+    generation = tt.generation[0]
+    if (tt.age[i] == generation) != (tt.age[j] == generation):
+        victim = i if tt.age[i] != generation else j
+    else:
+        victim = i if tt.visits[i] <= tt.visits[j] else j
+    tt.keys[victim] = key
+    tt.visits[victim] = 0
+    tt.wins[victim] = 0.0
+    tt.age[victim] = generation
+    return victim
+
+
+@njit(cache=True)
+def compact_subtree(nodes, new_root, new_id):
+    """Move the subtree of `new_root` to the front of the arrays and make it node 0.
+
+    A child is always allocated after its parent, so one forward pass from
+    `new_root` finds the whole subtree, and each kept node moves to an index no
+    larger than its old one: copying in increasing order never overwrites a
+    node that is still to be copied. The untried lists are packed the same way,
+    in increasing order of their start in the pool (see compact_pool).
+    """
+    size = nodes.size[0]
+    count = 0
+    for node in range(new_root, size):
+        if node == new_root or (nodes.parent[node] >= new_root and new_id[nodes.parent[node]] != -1):
+            new_id[node] = count
+            count += 1
+        else:
+            new_id[node] = -1
+
+    for node in range(new_root, size):
+        i = new_id[node]
+        if i == -1:
+            continue
+        if node == new_root:
+            nodes.parent[i] = -1
+            nodes.next_sibling[i] = -1
+        else:
+            nodes.parent[i] = new_id[nodes.parent[node]]
+            sibling = nodes.next_sibling[node]
+            nodes.next_sibling[i] = new_id[sibling] if sibling != -1 else -1
+        child = nodes.first_child[node]
+        nodes.first_child[i] = new_id[child] if child != -1 else -1
+        nodes.n_children[i] = nodes.n_children[node]
+        nodes.move[i] = nodes.move[node]
+        nodes.move2[i] = nodes.move2[node]
+        nodes.hash[i] = nodes.hash[node]
+        nodes.visits[i] = nodes.visits[node]
+        nodes.wins[i] = nodes.wins[node]
+        nodes.amaf_visits[i] = nodes.amaf_visits[node]
+        nodes.amaf_wins[i] = nodes.amaf_wins[node]
+        nodes.player_turn[i] = nodes.player_turn[node]
+        nodes.untried_start[i] = nodes.untried_start[node]
+        nodes.untried_size[i] = nodes.untried_size[node]
+        nodes.untried_count[i] = nodes.untried_count[node]
+        nodes.pair_children[i] = nodes.pair_children[node]
+    nodes.size[0] = count
+    compact_pool(nodes)
+
+
+@njit(cache=True)
+def compact_pool(nodes):
+    """Pack the untried lists to the front of the pool, dropping the slots no
+    node can hand out any more: a single-stone node keeps the moves it has not
+    popped yet, a pair node all its cells until its last pair is taken. Lists
+    move in increasing order of their start, so none is overwritten before it
+    is copied."""
+    used = 0
+    for i in np.argsort(nodes.untried_start[:nodes.size[0]]):
+        start = nodes.untried_start[i]
+        if start < 0:
+            continue
+        remaining = max(nodes.untried_count[i], 0)
+        n = nodes.untried_size[i] if nodes.pair_children[i] and remaining > 0 else remaining
+        for k in range(n):
+            nodes.untried[used + k] = nodes.untried[start + k]
+        nodes.untried_start[i] = used
+        nodes.untried_size[i] = n
+        used += n
+    nodes.pool_size[0] = used
+
+
+@njit(cache=True)
+def tree_full(nodes):
+    """True when the tree can't take another node, or the pool another node's
+    untried moves."""
+    return (nodes.size[0] >= nodes.parent.shape[0]
+            or nodes.pool_size[0] + BOARD_SIZE * BOARD_SIZE > nodes.untried.shape[0])
+
+
+@njit(cache=True)
+def add_candidates_around(cands, board, row, col, distance):
+    for r in range(max(row - distance, 0), min(row + distance + 1, BOARD_SIZE)):
+        for c in range(max(col - distance, 0), min(col + distance + 1, BOARD_SIZE)):
+            cell = r * BOARD_SIZE + c
+            if board[r, c] == 0 and cands.index[cell] == -1:
+                cands.index[cell] = cands.count[0]
+                cands.cells[cands.count[0]] = cell
+                cands.count[0] += 1
+
+
+@njit(cache=True)
+def find_candidates(board, distance):
+    """Empty cells at most `distance` rows and columns away from a stone (the centre on an empty board)."""
+    cands = Candidates(np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int16),
+                       np.full(BOARD_SIZE * BOARD_SIZE, -1, dtype=np.int16),
+                       np.zeros(1, dtype=np.int32))
+    for r in range(BOARD_SIZE):
+        for c in range(BOARD_SIZE):
+            if board[r, c] != 0:
+                add_candidates_around(cands, board, r, c, distance)
+    if cands.count[0] == 0 and board[BOARD_SIZE // 2, BOARD_SIZE // 2] == 0:
+        add_candidates_around(cands, board, BOARD_SIZE // 2, BOARD_SIZE // 2, 0)
+    return cands
+
+
+@njit(cache=True)
+def copy_candidates(src, dst):
+    n = src.count[0]
+    dst.cells[:n] = src.cells[:n]
+    dst.index[:] = src.index
+    dst.count[0] = n
+
+
+@njit(cache=True)
+def play_candidate(cands, board, cell, distance):
+    """Update `cands` for a stone just placed on `cell` of `board`."""
+    i = cands.index[cell]
+    if i != -1:
+        last = cands.cells[cands.count[0] - 1]
+        cands.cells[i] = last
+        cands.index[last] = i
+        cands.index[cell] = -1
+        cands.count[0] -= 1
+    add_candidates_around(cands, board, cell // BOARD_SIZE, cell % BOARD_SIZE, distance)
+
+
+@njit(cache=True)
+def plays_pair(nodes, node, n, pair_moves):
+    """True if the children of `node`, with n candidate cells, are stone pairs."""
+    turn = nodes.player_turn[node]
+    return pair_moves and n >= 2 and player_for_turn(turn) == player_for_turn(turn + 1)
+
+
+@njit(cache=True)
+def untried_slots(nodes, node, n, pair_moves):
+    """Pool slots fill_untried takes for `node` with n candidate cells."""
+    return min(n, PAIR_CANDIDATES) if plays_pair(nodes, node, n, pair_moves) else n
+
+
+@njit(cache=True)
+def fill_untried(nodes, node, start, cands, board, pair_moves):
+    """Copy the candidate cells to the pool at `start` in random order and set the node's counts.
+
+    If the side to move at `node` plays two stones and pair_moves is on, the
+    untried moves are the pairs of the PAIR_CANDIDATES cells with the highest
+    pattern_weight on `board` (ties in random order), and untried_count counts
+    pairs: the whole cross product of a midgame's candidates would give every
+    pair a visit or two and no information.
+    """
+    n = cands.count[0]
+    pair = plays_pair(nodes, node, n, pair_moves)
+    shuffled = np.empty(n, dtype=np.int16)
+    for k in range(n):
+        j = np.random.randint(k + 1)
+        shuffled[k] = shuffled[j]
+        shuffled[j] = cands.cells[k]
+
+    if pair and n > PAIR_CANDIDATES:
+        table = window_table_from_board(board)
+        player = player_for_turn(nodes.player_turn[node])
+        weights = np.empty(n, dtype=np.int64)
+        for k in range(n):
+            weights[k] = -pattern_weight(table, player, shuffled[k])
+        shuffled = shuffled[np.argsort(weights, kind="mergesort")[:PAIR_CANDIDATES]]
+        n = PAIR_CANDIDATES
+    nodes.untried[start:start + n] = shuffled
+
+    nodes.untried_size[node] = n
+    if pair:
+        nodes.pair_children[node] = 1
+        nodes.untried_count[node] = n * (n - 1) // 2
+    else:
+        nodes.pair_children[node] = 0
+        nodes.untried_count[node] = n
+
+
+@njit(cache=True)
+def pair_stride(total):
+    stride = max(int(total * 0.618), 1)
+    while math.gcd(stride, total) != 1:
+        stride += 1
+    return stride
+
+
+@njit(cache=True)
+def untried_move(nodes, node, n):
+    """Cells of the untried move handed out when untried_count goes from n to n - 1.
+
+    Pairs are never stored: the k-th pair handed out is number k * stride
+    (mod the number of pairs) in (i, j), i < j order, with a stride coprime
+    to that number, so every pair comes up exactly once and in scattered order.
+    """
+    start = nodes.untried_start[node]
+    if nodes.pair_children[node] == 0:
+        return nodes.untried[start + n - 1], -1
+
+    size = nodes.untried_size[node]
+    total = size * (size - 1) // 2
+    p = ((total - n) * pair_stride(total)) % total
+    i = 0
+    while p >= size - 1 - i:
+        p -= size - 1 - i
+        i += 1
+    cell = nodes.untried[start + i]
+    cell2 = nodes.untried[start + i + 1 + p]
+    return min(cell, cell2), max(cell, cell2)
+
+
+@njit(cache=True)
+def play_node_move(nodes, board, node):
+    player = player_for_turn(nodes.player_turn[node] - 1)
+    cell = nodes.move[node]
+    board[cell // BOARD_SIZE, cell % BOARD_SIZE] = player
+    cell2 = nodes.move2[node]
+    if cell2 != -1:
+        board[cell2 // BOARD_SIZE, cell2 % BOARD_SIZE] = player
+
+
+@njit(cache=True)
+def play_node_candidates(nodes, cands, board, node, distance):
+    play_candidate(cands, board, nodes.move[node], distance)
+    if nodes.move2[node] != -1:
+        play_candidate(cands, board, nodes.move2[node], distance)
+
+
+@njit(cache=True)
+def node_board(nodes, root_board, node):
+    """Rebuild the board of `node` by replaying its path from the root."""
+    board = root_board.copy()
+    while nodes.parent[node] != -1:
+        play_node_move(nodes, board, node)
+        node = nodes.parent[node]
+    return board
+
+
+@njit(cache=True)
+def board_status(board, row, col):
+    """Winner of the stone at (row, col), 0 for a full board, -1 if the game goes on."""
+    playerNum = board[row, col]
+    if playerNum != 0 and check_win(row, col, board, playerNum):
+        return playerNum
+    for r in range(BOARD_SIZE):
+        for c in range(BOARD_SIZE):
+            if board[r, c] == 0:
+                return -1
+    return 0
+
+
+@njit(cache=True)
+def node_status(nodes, board, node):
+    """board_status after the move of `node`, checking both stones of a pair."""
+    cell2 = nodes.move2[node]
+    if cell2 != -1:
+        row, col = cell2 // BOARD_SIZE, cell2 % BOARD_SIZE
+        if check_win(row, col, board, board[row, col]):
+            return board[row, col]
+    cell = nodes.move[node]
+    return board_status(board, cell // BOARD_SIZE, cell % BOARD_SIZE)
+
+
+@njit(cache=True)
+def is_fully_expanded(nodes, node):
+    return nodes.untried_start[node] >= 0 and nodes.untried_count[node] <= 0
+
+
+@njit(cache=True)
+def best_uct_child(nodes, node, config, tt):
+    """The child of `node` with the highest UCT value; an unvisited child comes first.
+
+    With config.rave the win rate is blended with the child's AMAF win rate,
+    which weighs beta = sqrt(k / (3 * visits + k)) for k = config.rave_equivalence:
+    all of it before the first visit, half at k visits, little beyond.
+    An unvisited child with AMAF statistics competes on them as if visited once.
+    """
+    parentVisit = nodes.visits[node]
+    # Shared by every child, so taken once per node rather than once per child
+    log_parent = math.log(parentVisit) if parentVisit > 0 else 0.0
+    max_uct_value = -1e9
+    best_child = -1
+
+    child = nodes.first_child[node]
+    while child != -1:
+        visits = nodes.visits[child]
+        wins = nodes.wins[child]
+        if config.transpositions:
+            # Every path to this position adds to its table entry
+            slot = tt_slot(tt, nodes.hash[child], False)
+            if slot != -1 and tt.visits[slot] > visits:
+                visits = tt.visits[slot]
+                wins = tt.wins[slot]
+        amaf_visits = nodes.amaf_visits[child]
+        if config.rave and amaf_visits > 0:
+            amaf_rate = nodes.amaf_wins[child] / amaf_visits
+            if visits == 0:
+                uct_val = amaf_rate + config.exploration * math.sqrt(log_parent)
+            else:
+                k = config.rave_equivalence
+                beta = math.sqrt(k / (3.0 * visits + k))
+                rate = (1.0 - beta) * wins / visits + beta * amaf_rate
+                uct_val = rate + config.exploration * math.sqrt(log_parent / visits)
+        elif visits == 0:
+            return child
+        else:
+            uct_val = wins / visits + config.exploration * math.sqrt(log_parent / visits)
+        if uct_val > max_uct_value:
+            max_uct_value = uct_val
+            best_child = child
+        child = nodes.next_sibling[child]
+    return best_child
+
+
+@njit(cache=True)
+def root_visit_lead(nodes):
+    """Visits of the most and of the second most visited child of the root."""
+    best = 0
+    second = 0
+    child = nodes.first_child[0]
+    while child != -1:
+        visits = nodes.visits[child]
+        if visits > best:
+            second = best
+            best = visits
+        elif visits > second:
+            second = visits
+        child = nodes.next_sibling[child]
+    return best, second
+
+
+@njit(cache=True)
+def select_node(nodes, board, cands, config, tt):
+    """Walk down from the root with UCT while nodes are fully expanded.
+
+    The moves are played on `board` and `cands`, which start as the root's.
+    """
+    node = 0
+    while is_fully_expanded(nodes, node) and nodes.first_child[node] != -1:
+        node = best_uct_child(nodes, node, config, tt)
+        play_node_move(nodes, board, node)
+        play_node_candidates(nodes, cands, board, node, config.distance)
+    return node
+
+
+@njit(cache=True)
+def expand_node(nodes, board, node, cands, config):
+    """Add a child of `node` for one of its untried moves, return it or -1.
+
+    On the first expansion the untried moves are taken from `cands`, the
+    candidate cells of `board` (the board of `node`).
+    """
+    if nodes.untried_start[node] == -1:
+        n = untried_slots(nodes, node, cands.count[0], config.pair_moves)
+        start = nodes.pool_size[0]
+        if start + n > nodes.untried.shape[0]:
+            return -1  # pool is full, keep the node as a leaf
+        nodes.pool_size[0] = start + n
+        fill_untried(nodes, node, start, cands, board, config.pair_moves)
+        nodes.untried_start[node] = start
+
+    n = nodes.untried_count[node]
+    if n <= 0:
+        return -1
+    nodes.untried_count[node] = n - 1
+    cell, cell2 = untried_move(nodes, node, n)
+    stones = 1 if cell2 == -1 else 2
+    child = new_node(nodes, node, cell, cell2, nodes.player_turn[node] + stones)
+    if child == -1:
+        # Tree is full: give the move back so it is still tried once there is room
+        nodes.untried_count[node] = n
+    return child
+
+
+@njit(cache=True)
+def backpropagate(nodes, node, playerNo, config, tt):
+    while node != -1:
+        score = 0.0
+        if player_for_turn(nodes.player_turn[node] - 1) == playerNo:
+            score = 1.0
+        if playerNo == 0:
+            score = 0.5
+        nodes.visits[node] += 1
+        nodes.wins[node] += score
+        if config.transpositions:
+            slot = tt_slot(tt, nodes.hash[node], True)
+            if slot != -1:
+                tt.visits[slot] += 1
+                tt.wins[slot] += score
+                tt.age[slot] = tt.generation[0]
+        node = nodes.parent[node]
+
+
+@njit(cache=True)
+def amaf_played(nodes, child, played):
+    # The player of `child`'s move if that player put a stone on each of its cells in the simulation, else 0
+    player = player_for_turn(nodes.player_turn[child] - 1)
+    if played[nodes.move[child]] != player:
+        return 0
+    if nodes.move2[child] != -1 and played[nodes.move2[child]] != player:
+        return 0
+    return player
+
+
+@njit(cache=True)
+def backpropagate_amaf(nodes, node, playerNo, played, shared):
+    """All-moves-as-first: for `node` and every node above it, credit the playout's
+    result to each child whose move the same player made anywhere later in the
+    simulation (tree path or rollout). played[cell] is the player of each stone
+    on the simulation's final board. With `shared`, counters change atomically
+    as in backpropagate_shared."""
+    while node != -1:
+        child = nodes.first_child[node]
+        while child != -1:
+            player = amaf_played(nodes, child, played)
+            if player != 0:
+                score = 0.5 if playerNo == 0 else (1.0 if player == playerNo else 0.0)
+                if shared:
+                    atomic_add(nodes.amaf_visits, child, 1)
+                    atomic_add(nodes.amaf_wins, child, score)
+                else:
+                    nodes.amaf_visits[child] += 1
+                    nodes.amaf_wins[child] += score
+            child = nodes.next_sibling[child]
+        node = nodes.parent[node]
+
+
+@njit(cache=True)
+def node_depth(nodes, node):
+    depth = 0
+    while nodes.parent[node] != -1:
+        node = nodes.parent[node]
+        depth += 1
+    return depth
+
+
+@njit(cache=True)
+def phase_start(config):
+    return cycle_counter() if config.instrument else 0
+
+
+@njit(cache=True)
+def read_cycle_counter():
+    return cycle_counter()
+
+
+@njit(cache=True)
+def record_phase(stats, config, phase, started):
+    # Adds the cycles since `started` to `phase`, returns the cycle counter
+    if not config.instrument:
+        return 0
+    now = cycle_counter()
+    stats[phase] += now - started
+    return now
+
+
+@njit(cache=True, nogil=True)
+def run_iterations(nodes, root_board, iterations, config, tt, stats):
+    """Run `iterations` rounds of selection, expansion, playout and backpropagation.
+
+    With config.instrument the rounds are counted and timed phase by phase
+    into `stats` (see the STAT_ indices); otherwise `stats` is left alone.
+    With config.rave every round also updates the AMAF statistics of the
+    path (see backpropagate_amaf). The batch ends early once tree_full;
+    returns the number of rounds run.
+    """
+    board = np.empty_like(root_board)
+    played = np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int8)
+    root_cands = find_candidates(root_board, config.distance)
+    cands = find_candidates(root_board, config.distance)
+    for iteration in range(iterations):
+        if tree_full(nodes):
+            return iteration
+        started = phase_start(config)
+        board[:] = root_board
+        copy_candidates(root_cands, cands)
+        node = select_node(nodes, board, cands, config, tt)
+        started = record_phase(stats, config, STAT_SELECT_CYCLES, started)
+
+        node_to_explore = node
+        if node_status(nodes, board, node) == -1:
+            child = expand_node(nodes, board, node, cands, config)
+            if child != -1:
+                node_to_explore = child
+                play_node_move(nodes, board, child)
+        started = record_phase(stats, config, STAT_EXPAND_CYCLES, started)
+
+        playout_result = node_status(nodes, board, node_to_explore)
+        plies = -1
+        if config.rave:
+            played[:] = board.ravel()
+        if playout_result == -1:
+            cell = nodes.move[node_to_explore]
+            playout_result, plies = run_playout(board, cell // BOARD_SIZE, cell % BOARD_SIZE,
+                                                nodes.player_turn[node_to_explore], config, played)
+        started = record_phase(stats, config, STAT_ROLLOUT_CYCLES, started)
+        backpropagate(nodes, node_to_explore, playout_result, config, tt)
+        if config.rave:
+            backpropagate_amaf(nodes, node_to_explore, playout_result, played, False)
+        record_phase(stats, config, STAT_BACKPROP_CYCLES, started)
+        if config.instrument:
+            count_iteration(stats, nodes, node, node_to_explore, plies)
+    return iterations
+
+
+@njit(cache=True)
+def count_iteration(stats, nodes, node, node_to_explore, plies):
+    depth = node_depth(nodes, node)
+    stats[STAT_ITERATIONS] += 1
+    stats[STAT_SELECT_DEPTH] += depth
+    stats[STAT_SELECT_DEPTH_MAX] = max(stats[STAT_SELECT_DEPTH_MAX], depth)
+    if node_to_explore != node:
+        stats[STAT_EXPANSIONS] += 1
+    if plies >= 0:
+        stats[STAT_ROLLOUTS] += 1
+        stats[STAT_ROLLOUT_PLIES] += plies
+
+
+@intrinsic
+def cycle_counter(typingctx):
+    """The CPU's cycle counter (rdtsc on x86, 0 where LLVM has none), for timing inside jitted code."""
+    def codegen(context, builder, signature, args):
+        fnty = ir.FunctionType(ir.IntType(64), [])
+        fn = cgutils.get_or_insert_function(builder.module, fnty, "llvm.readcyclecounter")
+        return builder.call(fn, [])
+    return types.int64(), codegen
+
+
+@intrinsic
+def atomic_add(typingctx, ary, i, val):
+    """ary[i] += val as a single atomic instruction, returns the old value."""
+    def codegen(context, builder, signature, args):
+        aryty, ity, valty = signature.args
+        ary, i, val = args
+        arr = context.make_array(aryty)(context, builder, ary)
+        ptr = cgutils.get_item_pointer(context, builder, aryty, arr, [i])
+        val = context.cast(builder, val, valty, aryty.dtype)
+        op = 'fadd' if isinstance(aryty.dtype, types.Float) else 'add'
+        return builder.atomic_rmw(op, ptr, val, 'seq_cst')
+    return ary.dtype(ary, i, val), codegen
+
+
+@intrinsic
+def atomic_cas(typingctx, ary, i, expected, new):
+    """Set ary[i] = new if it still holds `expected`, returns the value found."""
+    def codegen(context, builder, signature, args):
+        aryty, ity, expectedty, newty = signature.args
+        ary, i, expected, new = args
+        arr = context.make_array(aryty)(context, builder, ary)
+        ptr = cgutils.get_item_pointer(context, builder, aryty, arr, [i])
+        expected = context.cast(builder, expected, expectedty, aryty.dtype)
+        new = context.cast(builder, new, newty, aryty.dtype)
+        result = builder.cmpxchg(ptr, expected, new, 'seq_cst', 'seq_cst')
+        return builder.extract_value(result, 0)
+    return ary.dtype(ary, i, expected, new), codegen
+
+
+@njit(cache=True)
+def reserve_node_shared(nodes):
+    """Id for a new node in a tree other threads are growing at the same time,
+    -1 if the tree is full (the search clamps size afterwards)."""
+    if nodes.size[0] >= nodes.parent.shape[0]:
+        return -1
+    node = atomic_add(nodes.size, 0, 1)
+    if node >= nodes.parent.shape[0]:
+        return -1
+    return node
+
+
+@njit(cache=True)
+def new_node_shared(nodes, node, parent, cell, cell2, current_player):
+    """new_node for a tree other threads are growing at the same time, at the
+    id reserve_node_shared handed out. A parent of -1 leaves the node detached:
+    it is in no child list, and compact_subtree drops it."""
+    nodes.parent[node] = parent
+    nodes.first_child[node] = -1
+    nodes.n_children[node] = 0
+    nodes.move[node] = cell
+    nodes.move2[node] = cell2
+    nodes.hash[node] = child_hash(nodes, parent, cell, cell2, current_player)
+    nodes.visits[node] = 0
+    nodes.wins[node] = 0.0
+    nodes.amaf_visits[node] = 0
+    nodes.amaf_wins[node] = 0.0
+    nodes.player_turn[node] = current_player
+    nodes.untried_start[node] = -1
+    nodes.untried_count[node] = 0
+    if parent == -1:
+        return node
+
+    # Publish the node only once it is fully written
+    head = nodes.first_child[parent]
+    while True:
+        nodes.next_sibling[node] = head
+        found = atomic_cas(nodes.first_child, parent, head, node)
+        if found == head:
+            break
+        head = found
+    atomic_add(nodes.n_children, parent, 1)
+    return node
+
+
+@njit(cache=True)
+def expand_node_shared(nodes, board, node, cands, config):
+    """expand_node for a tree other threads are growing at the same time.
+
+    untried_start is -2 while one thread fills the node's untried list; the
+    others leave the node alone until it is published.
+    """
+    start = nodes.untried_start[node]
+    if start == -1:
+        n = untried_slots(nodes, node, cands.count[0], config.pair_moves)
+        if nodes.pool_size[0] + n > nodes.untried.shape[0]:
+            return -1
+        if atomic_cas(nodes.untried_start, node, -1, -2) != -1:
+            return -1
+        start = atomic_add(nodes.pool_size, 0, n)
+        if start + n > nodes.untried.shape[0]:
+            atomic_cas(nodes.untried_start, node, -2, -1)
+            return -1
+        fill_untried(nodes, node, start, cands, board, config.pair_moves)
+        atomic_cas(nodes.untried_start, node, -2, start)
+    elif start == -2:
+        return -1
+
+    # Take a node id before claiming a move, so a full tree never costs a move.
+    # Threads that lose the claim see a count <= 0, give it back and leave
+    # their id as a detached node.
+    child = reserve_node_shared(nodes)
+    if child == -1:
+        return -1
+    n = atomic_add(nodes.untried_count, node, -1)
+    if n <= 0:
+        atomic_add(nodes.untried_count, node, 1)
+        new_node_shared(nodes, child, -1, -1, -1, 0)
+        return -1
+    cell, cell2 = untried_move(nodes, node, n)
+    stones = 1 if cell2 == -1 else 2
+    return new_node_shared(nodes, child, node, cell, cell2, nodes.player_turn[node] + stones)
+
+
+@njit(cache=True)
+def backpropagate_shared(nodes, node, playerNo, config, tt):
+    while node != -1:
+        score = 0.0
+        if player_for_turn(nodes.player_turn[node] - 1) == playerNo:
+            score = 1.0
+        if playerNo == 0:
+            score = 0.5
+        # The real visit replaces the virtual loss added during selection
+        atomic_add(nodes.visits, node, 1 - config.virtual_loss)
+        atomic_add(nodes.wins, node, score)
+        if config.transpositions:
+            # Two threads may claim the same slot for different keys; that only mixes statistics
+            slot = tt_slot(tt, nodes.hash[node], True)
+            if slot != -1:
+                atomic_add(tt.visits, slot, 1)
+                atomic_add(tt.wins, slot, score)
+                tt.age[slot] = tt.generation[0]
+        node = nodes.parent[node]
+
+
+@njit(cache=True, nogil=True)
+def run_iterations_shared(nodes, root_board, iterations, config, tt, stats):
+    """run_iterations for several threads searching the same tree at once.
+
+    Counters change through atomic instructions and children are linked in
+    with compare-and-swap, so no lock is taken. Each node on a thread's path
+    holds config.virtual_loss extra visits until its playout is backed up,
+    which lowers its UCT value and sends the other threads down different paths.
+    Every thread needs its own `stats`.
+    """
+    virtual_loss = config.virtual_loss
+    board = np.empty_like(root_board)
+    played = np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int8)
+    root_cands = find_candidates(root_board, config.distance)
+    cands = find_candidates(root_board, config.distance)
+    for iteration in range(iterations):
+        if tree_full(nodes):
+            return iteration
+        started = phase_start(config)
+        board[:] = root_board
+        copy_candidates(root_cands, cands)
+        node = 0
+        atomic_add(nodes.visits, node, virtual_loss)
+        while is_fully_expanded(nodes, node) and nodes.first_child[node] != -1:
+            node = best_uct_child(nodes, node, config, tt)
+            atomic_add(nodes.visits, node, virtual_loss)
+            play_node_move(nodes, board, node)
+            play_node_candidates(nodes, cands, board, node, config.distance)
+        started = record_phase(stats, config, STAT_SELECT_CYCLES, started)
+
+        node_to_explore = node
+        if node_status(nodes, board, node) == -1:
+            child = expand_node_shared(nodes, board, node, cands, config)
+            if child != -1:
+                node_to_explore = child
+                atomic_add(nodes.visits, node_to_explore, virtual_loss)
+                play_node_move(nodes, board, child)
+        started = record_phase(stats, config, STAT_EXPAND_CYCLES, started)
+
+        playout_result = node_status(nodes, board, node_to_explore)
+        plies = -1
+        if config.rave:
+            played[:] = board.ravel()
+        if playout_result == -1:
+            cell = nodes.move[node_to_explore]
+            playout_result, plies = run_playout(board, cell // BOARD_SIZE, cell % BOARD_SIZE,
+                                                nodes.player_turn[node_to_explore], config, played)
+        started = record_phase(stats, config, STAT_ROLLOUT_CYCLES, started)
+        backpropagate_shared(nodes, node_to_explore, playout_result, config, tt)
+        if config.rave:
+            backpropagate_amaf(nodes, node_to_explore, playout_result, played, True)
+        record_phase(stats, config, STAT_BACKPROP_CYCLES, started)
+        if config.instrument:
+            count_iteration(stats, nodes, node, node_to_explore, plies)
+    return iterations
+
+
+class MonteCarloTreeSearch:
+    WIN_SCORE = 1
+    DEM = 0
+
+    def __init__(self, time_limit=6, workers=1, threads=1, seed=None, candidate_distance=CANDIDATE_DISTANCE,
+                 pair_moves=False, transpositions=False, tt_bytes=TT_BYTES, heavy_playouts=False,
+                 playout_cutoff=PLAYOUT_CUTOFF, exploration=EXPLORATION, early_stop=True, instrument=False,
+                 stats_callback=None, stats_file=None, solver_time=SOLVER_TIME, rave=False,
+                 rave_equivalence=RAVE_EQUIVALENCE):
+        self.opponent = 0
+        self.tree = Tree()
+        self.time_limit = time_limit
+        self.end = 0
+        # Stop a search early once its most visited move can no longer be overtaken
+        self.early_stop = early_stop
+        # With workers > 1, workers - 1 extra processes search the same position
+        # next to this one and their root statistics are added up (root parallelism)
+        self.workers = workers
+        self.pool = None
+        # With threads > 1 that many threads grow one shared tree (tree parallelism)
+        self.threads = threads
+        self.candidate_distance = candidate_distance
+        # In pair mode a move is a whole two-stone turn, and findNextMove returns both stones
+        self.pair_moves = pair_moves
+        # With transpositions the nodes of one position share statistics through a
+        # table of at most tt_bytes, kept for the whole game
+        self.transpositions = transpositions
+        self.tt = new_transposition_table(tt_bytes if transpositions else 0)
+        # Heavy playouts follow heavy_playout instead of playing random cells, and
+        # stop after playout_cutoff stones (0: play the game out)
+        self.heavy_playouts = heavy_playouts
+        # With rave, selection blends each child's win rate with its all-moves-as-first
+        # rate, trusting the latter less as the child's visits approach rave_equivalence
+        self.rave = rave
+        # With instrument (implied by a callback or a file) every findNextMove times
+        # its phases and leaves a dict in self.last_stats, which is also passed to
+        # stats_callback and appended to stats_file as one JSON line
+        self.instrument = bool(instrument or stats_callback or stats_file)
+        self.stats_callback = stats_callback
+        self.stats_file = stats_file
+        self.stats = np.zeros(N_STATS, dtype=np.float64)
+        self.last_stats = None
+        # Root visits per cell of the last findNextMove, summed over the workers (see visits_per_cell)
+        self.last_visits = None
+        # Fixed Python types, so every engine shares the kernels warm_up compiled
+        self.config = SearchConfig(distance=int(candidate_distance), pair_moves=bool(pair_moves),
+                                   transpositions=bool(transpositions), virtual_loss=int(VIRTUAL_LOSS),
+                                   heavy_playouts=bool(heavy_playouts), playout_cutoff=int(playout_cutoff),
+                                   exploration=float(exploration), instrument=self.instrument,
+                                   rave=bool(rave), rave_equivalence=float(rave_equivalence))
+        # Settings the root-parallel workers are built with
+        self.worker_options = dict(threads=threads, candidate_distance=candidate_distance, pair_moves=pair_moves,
+                                   transpositions=transpositions, tt_bytes=tt_bytes,
+                                   heavy_playouts=heavy_playouts, playout_cutoff=playout_cutoff,
+                                   exploration=exploration, early_stop=early_stop, instrument=self.instrument,
+                                   rave=rave, rave_equivalence=rave_equivalence)
+        # findNextMove first gives the threat solver up to solver_time seconds (0: never)
+        # and plays a forced win or the only defence it finds without searching
+        self.solver_time = solver_time
+        self.rng = random.Random(seed)
+        # Pondering: a thread growing the tree while the opponent thinks, and
+        # the flag that makes a running search return after its current batch
+        self.ponder_thread = None
+        self.stopped = False
+
+    def close(self):
+        self.stop_pondering()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def checkStatus(self, node):
+        board = self.tree.board(node)
+        return node_status(self.tree.nodes, board, node)
+
+    def advance(self, row, col):
+        """Tell the engine a stone was played at (row, col), by either side."""
+        self.stop_pondering()
+        self.tree.advance(row, col)
+
+    def start_pondering(self, state, max_nodes=None):
+        """Grow the tree for `state` on a background thread until the next
+        advance, findNextMove or stop_pondering, or until it has max_nodes
+        nodes (default: PONDER_SHARE of its capacity) or is full.
+
+        Meant for the opponent's turn: the replies they are considering get
+        searched, and advance keeps that part of the tree. Does nothing halfway
+        through a pair turn, whose root the tree can't search.
+        """
+        self.stop_pondering()
+        if not len(state) or self.tree.pending != -1:
+            return
+        if max_nodes is None:
+            max_nodes = int(self.tree.nodes.parent.shape[0] * PONDER_SHARE)
+        self.stopped = False
+        self.ponder_thread = threading.Thread(target=self.search, daemon=True,
+                                              args=(state.board.copy(), state.turn, state.last_move, math.inf),
+                                              kwargs=dict(max_nodes=max_nodes))
+        self.ponder_thread.start()
+
+    def stop_pondering(self):
+        if self.ponder_thread is not None:
+            self.stopped = True
+            self.ponder_thread.join()
+            self.ponder_thread = None
+
+    def find_move(self, state, **budget):
+        """findNextMove for the player to move in `state`, a GameState; takes the same budget arguments."""
+        if not len(state):
+            # Nothing to search on an empty board: black opens in the centre
+            centre = BOARD_SIZE // 2
+            return ChildStats((centre, centre), 0, 0.0), [], 0
+        return self.findNextMove(state.board, state.turn, state.last_move, **budget)
+
+    def findNextMove(self, board, playerNo, position, max_playouts=None, max_time=None, max_nodes=None,
+                     max_bytes=None):
+        """Search `board` and return the best root move, the top moves and the number of playouts.
+
+        The search stops at whichever comes first: max_time seconds (default
+        self.time_limit), max_playouts playouts, a tree of max_nodes nodes or
+        max_bytes bytes, or - with early_stop - once no other move can catch up
+        with the most visited one in what is left of the time. Early stop is off
+        under a playout budget, so max_playouts runs exactly that many playouts
+        unless time or memory runs out first. With workers > 1
+        every process gets the time and memory limits and its share of the playouts.
+        The threat solver runs first (see solver_time, at most half of max_time)
+        and its time counts too. However small the budget, one batch of playouts
+        runs, so a move always comes back while the board has an empty cell.
+        """
+        self.stop_pondering()
+        self.stopped = False
+        start = time.time()
+        self.end = start + (self.time_limit if max_time is None else max_time)
+        if self.solver_time > 0:
+            solution = solve(board, playerNo, min(self.solver_time, (self.end - start) / 2))
+            if solution.status in (SOLVE_WIN, SOLVE_DEFEND):
+                return self.solved_move(solution)
+        if max_bytes is not None:
+            byte_nodes = int(max_bytes // self.tree.bytes_per_node())
+            max_nodes = byte_nodes if max_nodes is None else min(max_nodes, byte_nodes)
+        seed = self.rng.randrange(2 ** 31)
+        if self.instrument:
+            return self.instrumented_search(board, playerNo, position, seed, max_playouts, max_nodes)
+        return self.run_search(board, playerNo, position, seed, max_playouts, max_nodes)
+
+    def solved_move(self, solution):
+        """findNextMove's result for the stones of a Solution, which took no playouts."""
+        cells = solution.cells if self.pair_moves else solution.cells[:1]
+        self.last_visits = np.zeros(BOARD_SIZE * BOARD_SIZE, dtype=np.float64)
+        for row, col in cells:
+            self.last_visits[row * BOARD_SIZE + col] = 1
+        stats = ChildStats(cells[0], 0, 0.0, cells[1] if len(cells) > 1 else None)
+        return stats, [stats], 0
+
+    def run_search(self, board, playerNo, position, seed, max_playouts, max_nodes):
+        shares = [None] * self.workers
+        if max_playouts is not None:
+            shares = [max_playouts // self.workers + (i < max_playouts % self.workers) for i in range(self.workers)]
+
+        pending = None
+        if self.workers > 1:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.workers - 1, initializer=_init_worker,
+                                                 initargs=(self.worker_options,))
+            tasks = [(board, playerNo, position, self.end, seed + i, shares[i], max_nodes)
+                     for i in range(1, self.workers)]
+            pending = self.pool.starmap_async(_search_worker, tasks)
+
+        dem = self.search(board, playerNo, position, seed=seed, max_playouts=shares[0], max_nodes=max_nodes)
+        moves, visits, wins = self.tree.root_stats()
+
+        if pending is not None:
+            results = pending.get()
+            moves = np.concatenate([moves] + [result[0] for result in results])
+            visits = np.concatenate([visits] + [result[1] for result in results])
+            wins = np.concatenate([wins] + [result[2] for result in results])
+            dem += sum(result[3] for result in results)
+            for result in results:
+                merge_stats(self.stats, result[4])
+
+        if len(moves) == 0:
+            # No root child, e.g. under a max_nodes of 1: fall back to the best-looking candidate cell
+            moves, visits, wins = fallback_move(board, playerNo), np.zeros(1, dtype=np.int64), np.zeros(1)
+        self.last_visits = visits_per_cell(moves, visits)
+        winnerNode, top_10_nodes = self.best_moves(moves, visits, wins)
+        return winnerNode, top_10_nodes, dem
+
+    def instrumented_search(self, board, playerNo, position, seed, max_playouts, max_nodes):
+        compile_seconds = [0.0]
+
+        def on_compile(seconds):
+            compile_seconds[0] += seconds
+
+        self.stats[:] = 0
+        start, start_cycles = time.time(), read_cycle_counter()
+        with event.install_timer("numba:compile", on_compile):
+            result = self.run_search(board, playerNo, position, seed, max_playouts, max_nodes)
+        seconds, cycles = time.time() - start, read_cycle_counter() - start_cycles
+
+        self.last_stats = self.search_stats(result[2], seconds, cycles / seconds if cycles > 0 else 0.0,
+                                            compile_seconds[0])
+        if self.stats_callback is not None:
+            self.stats_callback(self.last_stats)
+        if self.stats_file is not None:
+            with open(self.stats_file, "a") as file:
+                file.write(json.dumps(self.last_stats) + "\n")
+        return result
+
+    def search_stats(self, playouts, seconds, cycles_per_second, compile_seconds):
+        """self.stats and the shape of the tree as a JSON-friendly dict.
+
+        Phase times come from the cycle counter and are 0 on CPUs without one;
+        with workers > 1 the counts and times add up every process, the tree
+        figures are this process's.
+        """
+        stats = self.stats
+        scale = 1.0 / cycles_per_second if cycles_per_second > 0 else 0.0
+        iterations = max(stats[STAT_ITERATIONS], 1)
+        nodes, size = self.tree.nodes, len(self.tree)
+        expanded = nodes.untried_start[:size] >= 0
+        branching = np.bincount(nodes.n_children[:size][expanded])
+        return {
+            "playouts": int(playouts),
+            "seconds": seconds,
+            "selection": {"count": int(stats[STAT_ITERATIONS]),
+                          "depth_mean": stats[STAT_SELECT_DEPTH] / iterations,
+                          "depth_max": int(stats[STAT_SELECT_DEPTH_MAX]),
+                          "seconds": stats[STAT_SELECT_CYCLES] * scale},
+            "expansion": {"count": int(stats[STAT_EXPANSIONS]), "seconds": stats[STAT_EXPAND_CYCLES] * scale},
+            "rollout": {"count": int(stats[STAT_ROLLOUTS]),
+                        "length_mean": stats[STAT_ROLLOUT_PLIES] / max(stats[STAT_ROLLOUTS], 1),
+                        "seconds": stats[STAT_ROLLOUT_CYCLES] * scale},
+            "backprop": {"seconds": stats[STAT_BACKPROP_CYCLES] * scale},
+            "tree": {"nodes": size, "bytes": int(size * self.tree.bytes_per_node()),
+                     "tt_bytes": int(sum(a.nbytes for a in self.tt)),
+                     # branching[k]: number of expanded nodes with k children
+                     "branching": branching.tolist()},
+            "jit_compile_seconds": compile_seconds,
+        }
+
+    def search(self, board, playerNo, position, end=None, seed=None, max_playouts=None, max_nodes=None):
+        """Grow the tree for `board` until `end` (default self.end) or the budget
+        is spent (see next_batch), return the number of playouts."""
+        self.opponent = playerNo + 1
+        tree = self.tree
+        # Keep what earlier searches learned about this position, if the tree followed the game
+        if not tree.matches(board, self.opponent):
+            tree.set_root(board, position, self.opponent)
+
+        end = self.end if end is None else end
+        self.tt.generation[0] += 1
+        if self.threads > 1:
+            return self.search_threads(end, seed, max_playouts, max_nodes)
+
+        if seed is not None:
+            seed_rng(seed)
+        start = time.time()
+        dem = 0
+        while True:
+            # Once the pool runs out, the slots of moves already handed out are reused
+            if tree.full() and len(tree) < tree.nodes.parent.shape[0] and not tree.reclaim():
+                return dem
+            batch = self.next_batch(dem, start, end, max_playouts, max_nodes)
+            if batch == 0:
+                return dem
+            dem += run_iterations(tree.nodes, tree.root_board, batch, self.config, self.tt, self.stats)
+
+    def next_batch(self, dem, start, end, max_playouts, max_nodes, searchers=1):
+        """Iterations for the next jitted call after `dem` playouts, 0 when the search should stop.
+
+        `searchers` is the number of threads growing the tree, each with its own
+        `dem` and max_playouts. A full tree (see tree_full) ends the search.
+        """
+        now = time.time()
+        # The first batch runs whatever the time, so the root gets children
+        if (((self.stopped or now >= end) and dem > 0) or self.tree.full()
+                or (max_nodes is not None and len(self.tree) >= max_nodes)):
+            return 0
+        batch = ITERATIONS_PER_CALL
+        if max_playouts is not None:
+            batch = min(batch, max_playouts - dem)
+            if batch <= 0:
+                return 0
+        if self.early_stop and dem > 0 and max_playouts is None:
+            # Playouts the rest of the time can still run, at the rate so far
+            remaining = (end - now) * dem / max(now - start, 1e-6)
+            best, second = root_visit_lead(self.tree.nodes)
+            if best - second > remaining * searchers:
+                return 0
+        return batch
+
+    def search_threads(self, end, seed, max_playouts=None, max_nodes=None):
+        nodes, root_board = self.tree.nodes, self.tree.root_board
+        # The pool can only be packed while no thread is searching
+        if self.tree.full():
+            self.tree.reclaim()
+        config, tt = self.config, self.tt
+        counts = [0] * self.threads
+        stats = [np.zeros(N_STATS, dtype=np.float64) for _ in range(self.threads)]
+        start = time.time()
+
+        def work(index):
+            # Numba's random state is per thread, so every thread gets its own seed
+            seed_rng((seed if seed is not None else random.randrange(2 ** 31)) + 1000003 * index)
+            share = None
+            if max_playouts is not None:
+                share = max_playouts // self.threads + (index < max_playouts % self.threads)
+            dem = 0
+            while True:
+                batch = self.next_batch(dem, start, end, share, max_nodes, self.threads)
+                if batch == 0:
+                    break
+                dem += run_iterations_shared(nodes, root_board, batch, config, tt, stats[index])
+            counts[index] = dem
+
+        helpers = [threading.Thread(target=work, args=(index,)) for index in range(1, self.threads)]
+        for helper in helpers:
+            helper.start()
+        work(0)
+        for helper in helpers:
+            helper.join()
+
+        nodes.size[0] = min(nodes.size[0], nodes.parent.shape[0])
+        nodes.pool_size[0] = min(nodes.pool_size[0], nodes.untried.shape[0])
+        for thread_stats in stats:
+            merge_stats(self.stats, thread_stats)
+        return sum(counts)
+
+    @staticmethod
+    def best_moves(moves, visits, wins):
+        """Sum the statistics of equal moves, return the most visited one and the top 11 by win score.
+
+        `moves` holds move_key values. Of moves with the same visits the one
+        with the best win rate is returned, not the first in key order.
+        """
+        keys, inverse = np.unique(moves, return_inverse=True)
+        total_visits = np.bincount(inverse, weights=visits, minlength=len(keys))
+        total_wins = np.bincount(inverse, weights=wins, minlength=len(keys))
+
+        winnerNode = None
+        top_10_nodes = []
+        for k, key in enumerate(keys):
+            cell, cell2 = divmod(int(key), BOARD_SIZE * BOARD_SIZE + 1)
+            cell2 -= 1
+            position2 = None if cell2 == -1 else (cell2 // BOARD_SIZE, cell2 % BOARD_SIZE)
+            stats = ChildStats((cell // BOARD_SIZE, cell % BOARD_SIZE),
+                               int(total_visits[k]), float(total_wins[k]), position2)
+            if winnerNode is None or (stats.visitCount, stats.winScore) > (winnerNode.visitCount,
+                                                                          winnerNode.winScore):
+                winnerNode = stats
+            # Store nodes with the best winning scores
+            top_10_nodes.append(stats)
+
+        # Get the top 10 nodes based on winning scores
+        top_10_nodes = nlargest(11, top_10_nodes, key=lambda node: node.winScore)
+        return winnerNode, top_10_nodes
+
+    def selectPromisingNode(self):
+        board = self.tree.root_board.copy()
+        cands = find_candidates(board, self.candidate_distance)
+        return select_node(self.tree.nodes, board, cands, self.config, self.tt)
+
+    def expandNode(self, promising_node):
+        board = self.tree.board(promising_node)
+        cands = find_candidates(board, self.candidate_distance)
+        return expand_node(self.tree.nodes, board, promising_node, cands, self.config)
+
+    def simulateRandomPlayout(self, node):
+        # The whole rollout runs inside one jitted call
+        row, col = self.tree.position(node)
+        played = np.empty(BOARD_SIZE * BOARD_SIZE, dtype=np.int8)
+        return run_playout(self.tree.board(node), row, col, self.tree.nodes.player_turn[node], self.config,
+                           played)[0]
+
+    def backPropogation(self, nodeToExplore, playerNo):
+        backpropagate(self.tree.nodes, nodeToExplore, playerNo, self.config, self.tt)
+
+
+def fallback_move(board, playerNo):
+    """move_key array of the one candidate cell of `board` with the highest
+    pattern_weight for the player of stone playerNo + 1."""
+    cands = find_candidates(board, CANDIDATE_DISTANCE)
+    cells = cands.cells[:cands.count[0]]
+    table = window_table_from_board(np.asarray(board, dtype=np.int8))
+    player = player_for_turn(playerNo + 1)
+    best = max(cells, key=lambda cell: pattern_weight(table, player, cell))
+    return move_key([best], [-1])
+
+
+def merge_stats(total, stats):
+    """Add the instrumentation counters `stats` of one thread or process to `total`."""
+    depth_max = max(total[STAT_SELECT_DEPTH_MAX], stats[STAT_SELECT_DEPTH_MAX])
+    total += stats
+    total[STAT_SELECT_DEPTH_MAX] = depth_max
+
+
+# Engine of a root-parallel worker process, kept between searches
+_worker_engine = None
+
+
+def _init_worker(options):
+    global _worker_engine
+    warm_up()
+    _worker_engine = MonteCarloTreeSearch(**options)
+
+
+def _search_worker(board, playerNo, position, end, seed, max_playouts=None, max_nodes=None):
+    dem = _worker_engine.search(board, playerNo, position, end, seed, max_playouts, max_nodes)
+    moves, visits, wins = _worker_engine.tree.root_stats()
+    stats = _worker_engine.stats.copy()
+    _worker_engine.stats[:] = 0
+    return moves, visits, wins, dem, stats
+
+
+@njit( cache = True)
+def uctValue(totalVisit, nodeWinScore, nodeVisit, exploration=EXPLORATION):
+    if nodeVisit == 0:
+        return 1e9
+
+    return (nodeWinScore / nodeVisit) + exploration * math.sqrt(math.log(totalVisit) / nodeVisit)
+
+
+class UCT:
+
+    @staticmethod
+    def findBestNodeWithUCT(engine, node):
+        return best_uct_child(engine.tree.nodes, node, engine.config, engine.tt)
+
+
+
+
+def warm_up():
+    """Compile every jitted kernel, or load it from the on-disk cache, by using
+    each entry point once on a small tree. Returns the seconds it took.
+
+    Run `python connect6_final.py --warm-up` once after installing to fill the
+    cache, so a fresh process only pays for loading it.
+    """
+    start = time.time()
+    centre = BOARD_SIZE // 2
+    board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+    board[centre, centre] = 1
+    check_win(centre, centre, board, 1)
+    within_bounds(centre, centre)
+    uctValue(2, 1.0, 1)
+    perform_random_play(board.copy(), 1)
+
+    window_board = WindowBoard(board)
+    window_board.place(centre, centre + 1, 2)
+    window_board.immediate_win(1)
+    window_board.must_block(1)
+    window_board.evaluate(1)
+    window_board.remove(centre, centre + 1)
+
+    for threads in (1, 2):
+        engine = MonteCarloTreeSearch(threads=threads, seed=0, pair_moves=True, transpositions=True,
+                                      tt_bytes=1024, instrument=True)
+        engine.tree = Tree(256)
+        engine.findNextMove(board, 0, (centre, centre), max_playouts=64)
+        node = engine.selectPromisingNode()
+        child = engine.expandNode(node)
+        if child != -1:
+            engine.checkStatus(child)
+            engine.backPropogation(child, engine.simulateRandomPlayout(child))
+        UCT.findBestNodeWithUCT(engine, 0)
+        engine.advance(centre, centre + 1)
+        engine.advance(centre + 1, centre)
+    return time.time() - start
+
+
+_warm_up_thread = None
+
+
+def start_warm_up():
+    """Run warm_up in a background thread, so the window opens right away."""
+    global _warm_up_thread
+    _warm_up_thread = threading.Thread(target=warm_up, daemon=True)
+    _warm_up_thread.start()
+
+
+def wait_for_warm_up():
+    if _warm_up_thread is not None:
+        _warm_up_thread.join()
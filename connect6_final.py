@@ -1,19 +1,27 @@
-import tkinter as tk
 from enum import Enum
-import tkinter.messagebox
-import random
-import copy
-import time
+import sys
+import os
+import queue
+import threading
 import numpy as np
 import cProfile
-from functools import cache, lru_cache
-from heapq import nlargest
-import math
 
-from numba import jit,njit
-
-BOARD_SIZE = 19
-directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
+from connect6_book import OpeningBook
+from connect6_engine import (BOARD_SIZE, COLORS, GameState, MonteCarloTreeSearch, check_win, start_warm_up,
+                             wait_for_warm_up, warm_up)
+
+AI_WORKERS = os.cpu_count() or 1  # root-parallel searches the GUI runs for each AI stone
+AI_PAIR_MOVES = True  # the GUI searches both stones of the AI's turn at once
+AI_TRANSPOSITIONS = True  # the GUI shares statistics between transposed positions
+AI_HEAVY_PLAYOUTS = False  # True: the GUI's rollouts play wins, blocks and near-stone moves instead of random cells
+AI_RAVE = False  # True: the GUI's selection also trusts all-moves-as-first statistics (RAVE)
+AI_PLAYER = 2  # the AI plays red, the human opens with black
+AI_PONDER = True  # the AI keeps searching while the human thinks
+AI_POLL_MS = 50  # how often the GUI checks whether the AI thread has a move
+AI_BOOK = "book.npy"  # opening book the AI plays from before it searches, if the file exists
+BOARD_COLOR = "#dcb35c"
+CELL_SIZE = 32  # pixels between two lines of the board
+STONE_RADIUS = 13
 
 font_config = ("Helvetica", 10)
 
@@ -23,22 +31,108 @@ class Player(Enum):
     RED = "red"
 
 
+class BoardCanvas:
+    """The board drawn on one tk.Canvas.
+
+    Stones are canvas items made and changed one cell at a time, and `drawn`
+    remembers what each cell shows, so `show` only touches the cells whose
+    stone changed. Labels (search statistics) are a separate layer of text
+    items under the "overlay" tag that is cleared on its own.
+    """
+
+    def __init__(self, parent, on_click):
+        import tkinter as tk
+
+        size = CELL_SIZE * (BOARD_SIZE + 1)
+        self.canvas = tk.Canvas(parent, width=size, height=size, bg=BOARD_COLOR, highlightthickness=0)
+        for i in range(BOARD_SIZE):
+            low, high, at = self.centre(0), self.centre(BOARD_SIZE - 1), self.centre(i)
+            self.canvas.create_line(low, at, high, at)
+            self.canvas.create_line(at, low, at, high)
+        self.stones = {}  # (row, col) -> oval item
+        self.labels = {}  # (row, col) -> text item of the overlay
+        self.drawn = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)  # -1: highlighted
+        self.canvas.bind("<Button-1>", lambda event: self.click(event, on_click))
+
+    def grid(self, **options):
+        self.canvas.grid(**options)
+
+    @staticmethod
+    def centre(index):
+        return CELL_SIZE * (index + 1)
+
+    def click(self, event, on_click):
+        row = round(event.y / CELL_SIZE) - 1
+        col = round(event.x / CELL_SIZE) - 1
+        if 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE:
+            on_click(row, col)
+
+    def set_stone(self, row, col, player):
+        """Draw the stone of `player` at (row, col), 0 removes it."""
+        item = self.stones.get((row, col))
+        if player == 0:
+            if item is not None:
+                self.canvas.delete(item)
+                del self.stones[(row, col)]
+        elif item is None:
+            x, y = self.centre(col), self.centre(row)
+            self.stones[(row, col)] = self.canvas.create_oval(x - STONE_RADIUS, y - STONE_RADIUS,
+                                                              x + STONE_RADIUS, y + STONE_RADIUS,
+                                                              fill=COLORS[player], outline="black")
+            if self.labels:
+                # Labels stay on top of the stones
+                self.canvas.tag_raise("overlay")
+        else:
+            self.canvas.itemconfig(item, fill=COLORS[player])
+        self.drawn[row, col] = player
+
+    def show(self, board):
+        """Redraw the cells where `board` differs from what is on the canvas."""
+        for row, col in np.argwhere(board != self.drawn):
+            self.set_stone(row, col, int(board[row, col]))
+
+    def highlight(self, cells, color="green"):
+        """Paint the stones at `cells` in `color` until the next `show` that reaches them."""
+        for row, col in cells:
+            self.canvas.itemconfig(self.stones[(row, col)], fill=color)
+            self.drawn[row, col] = -1
+
+    def set_label(self, row, col, text):
+        item = self.labels.get((row, col))
+        if item is None:
+            self.labels[(row, col)] = self.canvas.create_text(self.centre(col), self.centre(row), text=text,
+                                                              font=font_config, fill="blue", tags="overlay")
+        else:
+            self.canvas.itemconfig(item, text=text)
+
+    def clear_labels(self):
+        self.canvas.delete("overlay")
+        self.labels.clear()
+
+
 class Connect6Game:
     def __init__(self):
+        # The rules and the stones live in the GameState, this class only shows them
+        self.state = GameState()
         self.current_player = Player.BLACK
-        self.board_state = [[""] * BOARD_SIZE for _ in range(BOARD_SIZE)]
-        self.stones_placed = 1
         self.game_over = False
-        self.buttons = [[None] * BOARD_SIZE for _ in range(BOARD_SIZE)]
-        self.game_states = []
-        self.max_undo = 20
-        self.redo_states = []
+        self.board_view = None
         self.turn = 0
         self.AI_MODE = False
-        self.current_board = []
         self.playout =0
+        # One search engine for the whole game so its tree follows the moves
+        self.monte_carlo = None
+        # The AI searches on its own thread and hands its move over through ai_results
+        self.ai_thread = None
+        self.ai_results = queue.Queue()
+        # Mapped once here, a book lookup costs a hash of the stones and a probe or two
+        self.book = OpeningBook.open(AI_BOOK) if os.path.exists(AI_BOOK) else None
 
     def setup_ui(self, root):
+        # The GUI toolkit is only imported by what builds the UI, headless users of the engine never load it
+        import tkinter as tk
+
+        self.root = root
         # Create the outer frame for the bigger board
         outer_frame = tk.Frame(root)
         outer_frame.grid(row=0, column=0, padx=100, pady=100)
@@ -60,13 +154,9 @@ class Connect6Game:
         inner_frame = tk.Frame(outer_frame)
         inner_frame.grid(row=1, column=1)
 
-        # Create buttons for the Connect 6 board and store them in the buttons list
-        for i in range(BOARD_SIZE):
-            for j in range(BOARD_SIZE):
-                button = tk.Button(inner_frame, width=4, height=1,
-                                   command=lambda row=i, col=j: self.place_stone(row, col))
-                button.grid(row=i, column=j)
-                self.buttons[i][j] = button
+        # One canvas draws the board, a click on it places a stone
+        self.board_view = BoardCanvas(inner_frame, self.place_stone)
+        self.board_view.grid(row=0, column=0)
 
             # Create a new frame for the "Save," "Load," "Back," and "Redo" buttons
         button_frame = tk.Frame(outer_frame)
@@ -104,93 +194,57 @@ class Connect6Game:
         self.play_with_ai_button = tk.Button(restart_frame, text=f"Play With AI: {self.AI_MODE}",
                                              command=self.play_with_ai)
         self.play_with_ai_button.grid(row=0, column=6, padx=10)
-        
+
         self.playout_button = tk.Button(restart_frame, text=f"Playout: {self.playout}")
         self.playout_button.grid(row=0, column=7, padx=10)
 
-    def place_stone(self, row, col, text=None, winner=None, _10_node=None):
+        # Scrubs through the game: the value is the number of stones on the board
+        self.history_scale = tk.Scale(restart_frame, from_=0, to=0, orient=tk.HORIZONTAL, showvalue=True,
+                                      label="Move", command=self.jump_to_move)
+        self.history_scale.grid(row=1, column=0, columnspan=8, sticky="ew", pady=(10, 0))
+
+    def place_stone(self, row, col):
         if self.game_over:
             return
+        if self.ai_thread is not None:
+            self.error_label.config(text="AI is thinking...")
+            return
 
         # Check if the clicked button is empty
-        if self.board_state[row][col] == "":
-            # Clear the redo stack when a new move is made
-            self.redo_states.clear()
-
-            # Save the current game state before making a move
-            prev_state = [row[:] for row in self.board_state]
-            prev_player = self.current_player
-            prev_stones_placed = self.stones_placed
-
-            # Update the board state and display the stone color
-            self.board_state[row][col] = self.current_player.value
-            # Change the button color
-            stone_color = self.current_player.value
-            self.buttons[row][col].configure(bg=stone_color)
-            # if text == None:
-            #     self.buttons[row][col].configure (bg=stone_color)
-            # elif text =='winner':
-            #     self.buttons[row][col].configure (bg=stone_color,text=f'{winner.state.winScore}/{winner.state.visitCount}')
-            #     for node, position in _10_node.items():
-            #         self.buttons[position[0]][position[1]].configure (bg='gray',text=f'{node.state.winScore}/{node.state.visitCount}')
-            self.stones_placed += 1
-
-            # Save the previous state to the game_states stack so we can back,redo,save,load,...
-            self.game_states.append((prev_state, prev_player, prev_stones_placed))
-
-            # Check for a win
-            if self.check_win(row, col):
-                self.show_win_message()
-                self.game_over = True
-                # Change the color of the winning stones to green
-                directions = [(1, 0), (0, 1), (1, 1), (-1, 1)]
-                for dr, dc in directions:
-                    winning_stones = [(row, col)]
-                    for offset in range(1, 6):
-                        new_row = row + dr * offset
-                        new_col = col + dc * offset
-                        if (0 <= new_row < 19 and 0 <= new_col < 19 and
-                                self.board_state[new_row][new_col] == self.current_player.value):
-                            winning_stones.append((new_row, new_col))
-                        else:
-                            break
-
-                    for offset in range(1, 6):
-                        new_row = row - dr * offset
-                        new_col = col - dc * offset
-                        if (0 <= new_row < 19 and 0 <= new_col < 19
-                                and self.board_state[new_row][new_col] == self.current_player.value):
-                            winning_stones.append((new_row, new_col))
-                        else:
-                            break
-
-                    if len(winning_stones) >= 6:
-                        for r, c in winning_stones:
-                            self.buttons[r][c].configure(bg="green")
-
-            elif self.check_draw():
-                self.show_draw_message()
-            elif self.stones_placed == 2:
-                # Switch to the next player's turn
-                # if next player is Player or AI
-                if self.AI_MODE == True:
-                    if self.current_player.value == "black":
-                        self.make_ai_move(np.array((row, col), dtype=np.int8))
-
-                elif self.AI_MODE == False:
-                    self.stones_placed = 0
-                    self.switch_player()
-
-            self.error_label.config(text="")
+        if not self.state.is_legal(row, col):
+            self.error_label.config(text="Invalid move. Cell is already occupied.")
+            return
 
+        # The state drops the stones Redo could replay unless this is the next one
+        player = self.state.play(row, col)
+        self.board_view.show(self.state.board)
+        if self.monte_carlo is not None:
+            self.monte_carlo.advance(row, col)
+        self.error_label.config(text="")
+        self.show_status()
 
-        else:
-            self.error_label.config(text="Invalid move. Cell is already occupied.")
-            # self.root.after(100, self.clear_error_label)
+        # The AI answers once the human's stones of the turn are down
+        if self.AI_MODE and not self.game_over and player != AI_PLAYER:
+            if self.state.to_move() == AI_PLAYER:
+                self.make_ai_move()
+            else:
+                self.start_pondering()
 
-    def update_button(self, row, col):
-        stone_color = "black" if self.board_state[row][col] == Player.BLACK.value else "red"
-        self.buttons[row][col].config(bg=stone_color)
+    def show_status(self):
+        """Bring the labels, the winning line and game_over in line with self.state."""
+        self.current_player = Player(COLORS[self.state.to_move()])
+        self.history_scale.config(to=self.state.length)
+        self.history_scale.set(self.state.ply)
+        self.next_turn_label.config(text=f"Next turn: {self.current_player.value}")
+        status = self.state.status()
+        self.game_over = False
+        self.win_label.config(text="")
+        if status > 0:
+            self.show_win_message()
+            # Change the color of the winning stones to green
+            self.board_view.highlight(self.state.winning_line())
+        elif status == 0:
+            self.show_draw_message()
 
     def clear_error_label(self):
         self.error_label.config(text="")
@@ -199,18 +253,13 @@ class Connect6Game:
         self.win_label.config(text="")
 
     def show_win_message(self):
-        self.win_label.config(text=f"{self.current_player.value} wins!")
+        self.win_label.config(text=f"{COLORS[self.state.winner]} wins!")
         self.game_over = True
 
     def show_draw_message(self):
         self.win_label.config(text="It's a draw!")
         self.game_over = True
 
-    def switch_player(self):
-
-        self.current_player = Player.RED if self.current_player == Player.BLACK else Player.BLACK
-        self.next_turn_label.config(text=f"Next turn: {self.current_player.value}")
-
     def checkStatus(self, row, col):
         """Check the status of the game at the given position."""
         if self.check_win(row, col):
@@ -221,625 +270,206 @@ class Connect6Game:
             return -1  # Tiếp tục
 
     def check_win(self, row, col):
-        """Check if the current player has won."""
-        directions = [(1, 0), (0, 1), (1, 1), (-1, 1)]
-        for dr, dc in directions:
-            count = 1  # Count the current player's stones
-            for offset in range(1, 6):  # Check up to 5 stones in each direction
-                new_row = row + dr * offset
-                new_col = col + dc * offset
-                if 0 <= new_row < 19 and 0 <= new_col < 19 and self.board_state[new_row][
-                    new_col] == self.current_player.value:
-                    count += 1
-                else:
-                    break
-
-            for offset in range(1, 6):
-                new_row = row - dr * offset
-                new_col = col - dc * offset
-                if 0 <= new_row < 19 and 0 <= new_col < 19 and self.board_state[new_row][
-                    new_col] == self.current_player.value:
-                    count += 1
-                else:
-                    break
-
-            if count >= 6:
-                return True
-
-        return False
+        """Check if the stone at (row, col) is part of six in a row."""
+        player = self.state.board[row, col]
+        return player != 0 and bool(check_win(row, col, self.state.board, player))
 
     def check_draw(self):
         """Check if the game ends in a draw."""
-        return all(all(cell != "" for cell in row) for row in self.board_state)
+        return self.state.status() == 0
 
     def clear_board(self):
         """Clear the board and reset the board state."""
-        for row in range(19):
-            for col in range(19):
-                self.buttons[row][col].config(bg="SystemButtonFace")
-                self.board_state[row][col] = ""
+        self.state = GameState()
+        self.show_board()
+
+    def show_board(self):
+        """Redraw the stones that differ from self.state and drop the labels."""
+        self.board_view.clear_labels()
+        self.board_view.show(self.state.board)
+        self.show_status()
 
     def save_moves(self):
         # Implement saving the game state to a file
         try:
-            with open("moves.txt", "w") as file:
-
-                for row in range(BOARD_SIZE):
-                    for col in range(BOARD_SIZE):
-                        if self.board_state[row][col] != "":
-                            # Write the move in the format: row col color
-                            file.write(f"{row} {col} {self.board_state[row][col]}\n")
-
-                self.win_label.config(text="success saving move")
+            self.state.save("moves.txt")
+            self.win_label.config(text="success saving move")
 
         except Exception as e:
             self.error_label.config(text="Error saving move")
             print(f"Error saving moves: {e}")
 
-    def load_moves(self):
+    def load_moves(self, prompt="Do you want to load the saved moves? This will clear the current board."):
+        """Ask, then replace the game with the one in moves.txt. Returns True if it was loaded."""
+        if self.board_locked():
+            return False
         try:
-            with open("moves.txt", "r") as file:
-                # Prompt the user for confirmation before loading moves
-                confirmation = tkinter.messagebox.askyesno("Confirm Load",
-                                                           "Do you want to load the saved moves? This will clear the current board.")
-
-                if confirmation:
-                    # Clear the current board
-                    self.clear_board()
-
-                    load_stones = 0
-
-                    for line in file:
-                        parts = line.strip().split()
-                        if len(parts) == 3:
-                            row, col, color = int(parts[0]), int(parts[1]), parts[2]
-                            if 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE:
-                                if color == Player.BLACK.value:
-                                    self.board_state[row][col] = Player.BLACK.value
-                                    self.update_button(row, col)
-                                    load_stones += 1
-                                elif color == Player.RED.value:
-                                    self.board_state[row][col] = Player.RED.value
-                                    self.update_button(row, col)
-                                    load_stones += 1
-
-                    # Set the number of stones placed based on the loaded state
-
-                    print("Stones after load: " + str(load_stones))
-                    if load_stones % 4 == 2:
-                        self.current_player = Player.RED
-                        self.stones_placed = 1
-                    elif load_stones % 4 == 3:
-                        self.current_player = Player.RED
-                        self.switch_player()
-                        self.stones_placed = 0
-                    elif load_stones % 4 == 0:
-                        self.current_player = Player.BLACK
-                        self.stones_placed = 1
-                    elif load_stones % 4 == 1:
-                        self.current_player = Player.BLACK
-                        self.switch_player()
-                        self.stones_placed = 0
-
-
-
-
+            # Prompt the user for confirmation before loading moves
+            from tkinter import messagebox
+            confirmation = messagebox.askyesno("Confirm Load", prompt)
+            if not confirmation:
+                return False
+            state = GameState.load("moves.txt")
 
         except FileNotFoundError:
             # The file does not exist, so we create a new one
             with open("moves.txt", "w") as file:
                 # Add any initial content to the new file if needed
                 print("A new 'moves.txt' file has been created.")
+            return False
 
-    def load_moves_step_by_step(self):
+        except ValueError as e:
+            self.error_label.config(text="Error loading moves")
+            print(f"Error loading moves: {e}")
+            return False
 
-        try:
-            with open("moves.txt", "r") as file:
-                # Prompt the user for confirmation before loading moves
-                confirmation = tkinter.messagebox.askyesno("Confirm Load",
-                                                           "Do you want to load step by step? This will clear the current board.")
-
-                if confirmation:
-                    # Clear the current board
-                    self.clear_board()
-                    load_stones = 0
-                    for line in file:
-                        parts = line.strip().split()
-                        if len(parts) == 3:
-                            row, col, color = int(parts[0]), int(parts[1]), parts[2]
-                            if 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE:
-                                if color == Player.BLACK.value:
-                                    self.board_state[row][col] = Player.BLACK.value
-                                    self.update_button(row, col)
-
-                                    load_stones += 1
-                                elif color == Player.RED.value:
-                                    self.board_state[row][col] = Player.RED.value
-                                    self.update_button(row, col)
-                                    load_stones += 1
-
-                    # Set the number of stones placed based on the loaded state
-
-                    print("Stones after load: " + str(load_stones))
-                    if load_stones % 4 == 2:
-                        self.current_player = Player.RED
-                        self.stones_placed = 1
-                    elif load_stones % 4 == 3:
-                        self.current_player = Player.RED
-                        self.switch_player()
-                        self.stones_placed = 0
-                    elif load_stones % 4 == 0:
-                        self.current_player = Player.BLACK
-                        self.stones_placed = 1
-                    elif load_stones % 4 == 1:
-                        self.current_player = Player.BLACK
-                        self.switch_player()
-                        self.stones_placed = 0
+        print("Stones after load: " + str(len(state)))
+        self.state = state
+        self.show_board()
+        return True
 
-        except FileNotFoundError:
-            # The file does not exist, so we create a new one
-            with open("moves.txt", "w") as file:
-                # Add any initial content to the new file if needed
-                print("A new 'moves.txt' file has been created.")
+    def load_moves_step_by_step(self):
+        # Load the game rewound to the first stone, Redo then replays it stone by stone
+        if self.load_moves("Do you want to load step by step? This will clear the current board."):
+            self.state.jump(1)
+            self.show_board()
+
+    def board_locked(self):
+        """True (and says so) while the AI is thinking; otherwise stops any pondering,
+        since the position is about to change under it."""
+        if self.ai_thread is not None:
+            self.error_label.config(text="AI is thinking...")
+            return True
+        if self.monte_carlo is not None:
+            self.monte_carlo.stop_pondering()
+        return False
 
     def back_move(self):
-        if self.game_states:
-
-            self.redo_states.append((self.board_state, self.current_player, self.stones_placed))
-
-            # Restore the previous game state
-            prev_state, prev_player, prev_stones_placed = self.game_states.pop()
-            self.board_state, self.current_player, self.stones_placed = prev_state, prev_player, prev_stones_placed
-
-            # Clear the buttons for the previous moves (set them to the default color)
-            for row in range(BOARD_SIZE):
-                for col in range(BOARD_SIZE):
-                    self.buttons[row][col].configure(bg="SystemButtonFace")
-
-            # Update the UI to match the restored state
-            for row in range(BOARD_SIZE):
-                for col in range(BOARD_SIZE):
-                    stone_color = self.board_state[row][col]
-                    if stone_color != "":
-                        self.buttons[row][col].configure(bg=stone_color)
-
-            # Switch the player label
-            self.next_turn_label.config(text=f"Next turn: {self.current_player.value}")
-            self.game_over = False
-            self.win_label.config(text=f"")
-            self.error_label.config(text=f"")
+        if self.board_locked():
+            return
+        if len(self.state):
+            self.state.undo()
 
+            # Repaints the cell taken back and the stones that were shown as the winning six
+            self.board_view.show(self.state.board)
+            self.show_status()
+            self.error_label.config(text=f"")
 
         else:
             self.error_label.config(text="player not allow to back anymore")
             # self.root.after(1000, self.clear_error_label())
 
     def redo_move(self):
-        if self.redo_states:
-            # Push the current game state to the game_states stack
-            self.game_states.append((self.board_state, self.current_player, self.stones_placed))
-
-            # Restore the next game state from the redo stack
-            next_state, next_player, next_stones_placed = self.redo_states.pop()
-            self.board_state, self.current_player, self.stones_placed = next_state, next_player, next_stones_placed
-
-            # Update the UI to match the restored state
-            for row in range(BOARD_SIZE):
-                for col in range(BOARD_SIZE):
-                    stone_color = self.board_state[row][col]
-                    if stone_color != "":
-                        self.buttons[row][col].configure(bg=stone_color)
-                        if self.check_win(row, col):
-                            self.show_win_message()
-                            self.game_over = True
-                            # Change the color of the winning stones to green
-                            directions = [(1, 0), (0, 1), (1, 1), (-1, 1)]
-                            for dr, dc in directions:
-                                winning_stones = [(row, col)]
-                                for offset in range(1, 6):
-                                    new_row = row + dr * offset
-                                    new_col = col + dc * offset
-                                    if (0 <= new_row < 19 and 0 <= new_col < 19 and
-                                            self.board_state[new_row][new_col] == self.current_player.value):
-                                        winning_stones.append((new_row, new_col))
-                                    else:
-                                        break
-
-                                for offset in range(1, 6):
-                                    new_row = row - dr * offset
-                                    new_col = col - dc * offset
-                                    if (0 <= new_row < 19 and 0 <= new_col < 19
-                                            and self.board_state[new_row][new_col] == self.current_player.value):
-                                        winning_stones.append((new_row, new_col))
-                                    else:
-                                        break
-
-                                if len(winning_stones) >= 6:
-                                    for r, c in winning_stones:
-                                        self.buttons[r][c].configure(bg="green")
-
-            # Switch the player label
-            self.next_turn_label.config(text=f"Next turn: {self.current_player.value}")
+        if self.board_locked():
+            return
+        if self.state.ply < self.state.length:
+            self.state.redo()
+            self.board_view.show(self.state.board)
+            self.show_status()
 
         else:
             self.error_label.config(text="Can not redo because this is the futhest move")
-            self.root.after(100, self.clear_error_label)
+
+    def jump_to_move(self, value):
+        """Slider callback: show the game after `value` stones of its log."""
+        ply = int(value)
+        if ply == self.state.ply:
+            return
+        if self.board_locked():
+            self.history_scale.set(self.state.ply)
+            return
+        self.state.jump(ply)
+        self.board_view.show(self.state.board)
+        self.show_status()
 
     def restart_game(self):
+        if self.board_locked():
+            return
         # Clear the board and reset the game state
         self.clear_board()
-        self.current_player = Player.BLACK
-        self.stones_placed = 1
-        self.game_over = False
-        self.clear_win_label()
-        for i in range(BOARD_SIZE):
-            for j in range(BOARD_SIZE):
-                self.buttons[i][j].configure(text='')
         self.playout = 0
         self.playout_button.config(text=f"Playout: {self.playout}")
 
     def play_with_ai(self):
+        if self.board_locked():
+            return
         self.AI_MODE = not self.AI_MODE
         self.play_with_ai_button.config(text=f"Play With AI: {self.AI_MODE}")  # Update button text
 
-        if self.AI_MODE:
-            # Restart the board
-            self.restart_game()
-
-            # Player (black) plays first
-            self.current_player = Player.BLACK
-            self.stones_placed = 1
-
-        else:
-            self.restart_game()
-
-    def make_ai_move(self, position):
-        # print("AI turn")
-        # if self.stones_placed == 2:
-        #     self.stones_placed =0
-        #     self.switch_player()
-
-        self.stones_placed = 0
-        self.switch_player()
-
-        while self.stones_placed < 2:
-            print("lược chơi hiện tại của AI: " , str(self.turn))
-
-            tkinter.messagebox.showinfo("Confirm play", "AI play the " + str(self.stones_placed + 1) + " move")
-            numpy_board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
-            for i in range(BOARD_SIZE):
-                for j in range(BOARD_SIZE):
-                    if self.board_state[i][j] == 'black':
-                        numpy_board[i, j] = 1
-                    elif self.board_state[i][j] == 'red':
-                        numpy_board[i, j] = 2
-
-            for i in range(BOARD_SIZE):
-                for j in range(BOARD_SIZE):
-                    self.buttons[i][j].configure(text='')
-
-            monte_carlo = MonteCarloTreeSearch()
-            winner_node, _10_best_node_winCrore, count_dem = monte_carlo.findNextMove(numpy_board, self.turn, position)
-            print("so playout: ", count_dem)
-            self.playout = count_dem
-            self.playout_button.config(text=f"Playout: {self.playout}")  # Update button text
-
-            # print("lược chơi hiện tại: " , str(self.turn))
-            new_lst = [[""] * BOARD_SIZE for _ in range(BOARD_SIZE)]
-            for i in range(BOARD_SIZE):
-                for j in range(BOARD_SIZE):
-                    if winner_node.state.board[i, j] == 1:
-                        new_lst[i][j] = "black"
-                    elif winner_node.state.board[i, j] == 2:
-                        new_lst[i][j] = "red"
-
-            flag = False
-            row = 0
-            col = 0
-            for i in range(BOARD_SIZE):
-                for j in range(BOARD_SIZE):
-                    if new_lst[i][j] != self.board_state[i][j]:
-                        # self.stones_placed +=1
-                        self.turn += 1
-                        row = i
-                        col = j
-                        self.place_stone(row, col, text='winner')
-                        self.buttons[row][col].configure(
-                            text=f'{winner_node.state.winScore}_{winner_node.state.visitCount}')
-                        # flag = True
-                        break
-
-            for child in _10_best_node_winCrore[1:11]:
-
-                for i in range(BOARD_SIZE):
-                    for j in range(BOARD_SIZE):
-                        if self.board_state[i][j] == '' and child.state.board[i, j] != 0:
-                            self.buttons[i][j].configure(
-                                text='{}_{}'.format(child.state.winScore, child.state.visitCount))
-                            break
-            if self.stones_placed == 2:
-                break
-
-        if self.stones_placed == 2:
-            self.stones_placed = 0
-            self.switch_player()
-
-
-class Node:
-    def __init__(self, state, parent=None):
-        self.state = state
-        self.parent = parent
-        self.childArray = []
-
-
-    def is_fully_expand(self):
-        return len(self.childArray) == 361 - self.state.current_player
-
-
-
-class Tree:
-    def __init__(self):
-        self.root = Node(None)
-
-    def set_root(self, node):
-        self.root = node
-
-
-class State:
-    def __init__(self, board, current_player):
-        self.board = board
-        self.current_player = current_player
-        self.visitCount = 0
-        self.winScore = 0
-        self.position = None
-
-    def randomPlay(self):
-        return perform_random_play(self.board, self.current_player)
-
-        # player = 1 if (self.current_player - 1) % 4 in {0, 3} else 2
-        #
-        #     empty_cells = np.transpose(np.where(self.board == 0))
-        #     if empty_cells.size > 0:
-        #         random_move = random.choice(empty_cells)
-        #         self.board[random_move[0], random_move[1]] = player
-        #         return self.board, tuple(random_move)
-
-
-# @jit(nopython=True)
-@njit(cache = True)
-def perform_random_play(board, current_player):
-    player = 1 if (current_player - 1) % 4 in {0, 3} else 2
-
-    # empty_cells = np.transpose(np.where(board == 0))
-    empty_cells = np.argwhere(board == 0)
-    if empty_cells.size > 0:
-
-        random_index = random.randint(0, empty_cells.shape[0] - 1)
-        random_move = empty_cells[random_index]
-
-        board[random_move[0], random_move[1]] = player
-        return board, random_move
-
-@njit(cache = True)
-def within_bounds(row, col):
-    return (0 <= row < BOARD_SIZE) and (0 <= col < BOARD_SIZE)
-
-@njit(cache=True)
-
-def check_win(row, col, board, playerNum):
-    # This function is now decorated with Numba for optimization
-    directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
-    # opponent = 3 - playerNum
-
-    for dr, dc in directions:
-        count = 1  # Count the current player's stones
-        for offset in range(1, 6):  # Check up to 5 stones in each direction
-            new_row = row + dr * offset
-            new_col = col + dc * offset
-           
-            if within_bounds(new_row,new_col) and  board[new_row, new_col] == playerNum:
-
-                count += 1
-            else:
-                break
-
-        for offset in range(1, 6):
-            new_row = row - dr * offset
-            new_col = col - dc * offset
-            if within_bounds(new_row,new_col) and  board[new_row, new_col] == playerNum:
-                count += 1
-            else:
-                break
-
-        if count >= 6:
-            return playerNum
-    return False
-
-
-
-
-
-
-
-class MonteCarloTreeSearch:
-    WIN_SCORE = 1
-    DEM = 0
-
-    def __init__(self):
-        self.opponent = 0
-
-        self.end = time.time() + 6
-
-    
-
-    def checkStatus(self, node, check_row, check_col):
-        board = node.state.board
-        playerNum = board[check_row,check_col]
-
-        # if check_row is not None and check_col is not None:
-        result = check_win(check_row, check_col, board, playerNum)
-        if result:
-            return result
-        else:
-            # Checking for empty cells without using np.any()
-            if 0 in board:
-                return -1
-            return 0
-
-    def findNextMove(self, board, playerNo, position):
-        self.opponent = playerNo + 1
-        tree = Tree()
-
-        rootNode = tree.root  # mặc định parent = None
-        state = State(board, self.opponent)
-        rootNode.state = state
-        rootNode.state.position = position
-        # self.end = time.time() + 5
-        dem = 0
-        while time.time() < self.end:
-
-            node = rootNode
-            while node.is_fully_expand():
-                node = self.selectPromisingNode(node)
-
-            if self.checkStatus(node, check_row=node.state.position[0], check_col=node.state.position[1]) == -1:
-                if not node.is_fully_expand():
-                    self.expandNode(node)
-            node_to_explore = node
-            if node.childArray:
-                node_to_explore = random.choice(node.childArray)
-            playout_result = self.simulateRandomPlayout(node_to_explore)
-            self.backPropogation(node_to_explore, playout_result)
-            dem += 1
-
-        max_visit = 0
-        winnerNode = None
-        top_10_nodes = []
-        total_visit = 0
-        for child in rootNode.childArray:
-            total_visit += child.state.visitCount
-            if child.state.visitCount > max_visit:
-                winnerNode = child
-                max_visit = child.state.visitCount
-            # Store nodes with the best winning scores
-            top_10_nodes.append(child)
-
-        # Get the top 10 nodes based on winning scores
-        top_10_nodes = nlargest(11, top_10_nodes, key=lambda node: node.state.winScore)
-
-       
-        tree.set_root(winnerNode)
-        return winnerNode, top_10_nodes, dem
-
-    def selectPromisingNode(self, rootNode):
-        node = rootNode  # node thay đổi thì rootNode thay đổi
-        # Kiểm tra node có con không ?
-        while len(node.childArray) != 0:
-            node = UCT.findBestNodeWithUCT(node)
-        return node
-
-    def expandNode(self, promising_node):
-        possible_states = np.transpose(np.where(promising_node.state.board == 0))
-
-        random_index = np.random.randint(len(possible_states))
-        random_position = possible_states[random_index]
-
-        playerNo = promising_node.state.current_player % 4
-        if playerNo in {0, 3}:
-            playerNo = 1
-        else:
-            playerNo = 2
-
-        # Create a copy of the board only for modification
-        temp_board = np.copy(promising_node.state.board)
-        temp_board[random_position[0], random_position[1]] = playerNo
-
-        state = State(temp_board, promising_node.state.current_player + 1)
-        state.position = random_position
-        child_node = Node(state, promising_node)
-
-        promising_node.childArray.append(child_node)
-
-   
-
-    def simulateRandomPlayout(self, node):
-        state = State(
-            board=np.copy(node.state.board),
-            current_player=node.state.current_player
-        )
-        temp_node = Node(state)
-
-        boardStatus = self.checkStatus(temp_node, node.state.position[0], node.state.position[1])
-
-        while boardStatus == -1:
-            temp_node.state.board, position = temp_node.state.randomPlay()
-            temp_node.state.current_player += 1
-            # print("({},{}): {}".format(position[0], position[1], "đen" if temp_node.state.board[position[0]][position[1]] == 1 else "trắng"))
-
-            boardStatus = self.checkStatus(temp_node, position[0], position[1])
-
-
-        # check_board = temp_node.state.board
-        return boardStatus
-
-       
-    def backPropogation(self, nodeToExplore, playerNo):
-        tempNode = nodeToExplore
-
-        while tempNode is not None:
-            tempNode.state.visitCount += 1
+        # Restart the board, the player (black) plays first
+        self.restart_game()
+
+    def make_ai_move(self):
+        """Start the AI's search on a background thread; check_ai_move places its stones."""
+        self.board_view.clear_labels()
+        if self.monte_carlo is None:
+            self.monte_carlo = MonteCarloTreeSearch(workers=AI_WORKERS, pair_moves=AI_PAIR_MOVES,
+                                                    transpositions=AI_TRANSPOSITIONS,
+                                                    heavy_playouts=AI_HEAVY_PLAYOUTS,
+                                                    rave=AI_RAVE)
+        print("lược chơi hiện tại của AI: " , str(self.state.turn))
+        # Index of the last stone on the board, which is what the engine counts turns by
+        self.turn = self.state.turn
+        book_move = self.book.find_move(self.state) if self.book is not None else None
+        if book_move is not None:
+            self.play_ai_move(book_move, [], 0)
+            return
+        self.error_label.config(text="AI is thinking...")
+        self.ai_thread = threading.Thread(target=self.think, args=(self.state.copy(),), daemon=True)
+        self.ai_thread.start()
+        self.root.after(AI_POLL_MS, self.check_ai_move)
+
+    def think(self, state):
+        # Runs on the AI thread: only the engine is used here, Tk widgets belong to the main thread
+        # Kernels still compiling or loading at startup would eat into the search time
+        wait_for_warm_up()
+        self.ai_results.put(self.monte_carlo.find_move(state))
+
+    def check_ai_move(self):
+        try:
+            winner_node, _10_best_node_winCrore, count_dem = self.ai_results.get_nowait()
+        except queue.Empty:
+            self.root.after(AI_POLL_MS, self.check_ai_move)
+            return
+        self.ai_thread.join()
+        self.ai_thread = None
+        self.play_ai_move(winner_node, _10_best_node_winCrore, count_dem)
 
-            player_turn = (tempNode.state.current_player - 1) % 4
-            if player_turn in {0, 3}:
-                player_turn = 1
+    def play_ai_move(self, winner_node, _10_best_node_winCrore, count_dem):
+        """Place the stones of a search or book result and hand the turn on."""
+        self.error_label.config(text="")
+        print("so playout: ", count_dem)
+        self.playout = count_dem
+        self.playout_button.config(text=f"Playout: {self.playout}")  # Update button text
+
+        # In pair mode one search gives both stones of the turn
+        for cell in (winner_node.position, winner_node.position2):
+            if cell is not None and not self.game_over:
+                row, col = cell
+                self.place_stone(row, col)
+                self.board_view.set_label(row, col, f'{winner_node.winScore}_{winner_node.visitCount}')
+
+        for child in _10_best_node_winCrore[1:11]:
+            for cell in (child.position, child.position2):
+                if cell is not None and self.state.board[cell] == 0:
+                    self.board_view.set_label(cell[0], cell[1], '{}_{}'.format(child.winScore, child.visitCount))
+
+        if not self.game_over:
+            if self.state.to_move() == AI_PLAYER:
+                # Single-stone searches: one more for the second stone of the turn
+                self.make_ai_move()
             else:
-                player_turn = 2
-
-            if player_turn == playerNo:
-                tempNode.state.winScore += 1
-            if playerNo == 0:
-                tempNode.state.winScore += 0.5
-
-            tempNode = tempNode.parent
-
-
-
-@njit( cache = True)
-def uctValue(totalVisit, nodeWinScore, nodeVisit):
-    if nodeVisit == 0:
-        return 1e9
-
-    return (nodeWinScore / nodeVisit) + 1.41 * math.sqrt(math.log(totalVisit) / nodeVisit)
-
-
-class UCT:
-
-    
-
-    @staticmethod
-    def findBestNodeWithUCT(node):
-
-        parentVisit = node.state.visitCount
-        max_uct_value = -1e9
-        best_child = Node(None)
-
-        for child in node.childArray:
-            uct_val = uctValue(parentVisit, child.state.winScore, child.state.visitCount)
-            if uct_val > max_uct_value:
-                max_uct_value = uct_val
-                best_child = child
-        return best_child
-
-
-
-
-
-
-
+                self.start_pondering()
 
+    def start_pondering(self):
+        if AI_PONDER and self.monte_carlo is not None and not self.game_over:
+            self.monte_carlo.start_pondering(self.state)
 
 
 def main():
+    import tkinter as tk
+
+    start_warm_up()
     root = tk.Tk()
     root.title("Connect 6 Game")
 
@@ -850,5 +480,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if "--warm-up" in sys.argv:
+        print(f"kernels ready in {warm_up():.2f}s")
+    else:
+        main()
     # cProfile.run('main()', sort="tottime")
@@ -0,0 +1,322 @@
+"""Game records: whole collections of Connect6 games in play order.
+
+Two formats hold the same games:
+
+* text, one game per line: the result (black, red, draw or - while the game
+  goes on) and then the stones as row,col in the order they were played,
+  e.g. ``black 9,9 9,10 10,10 8,8 ...``
+* binary (.c6g), for archives of millions of games: an 8 byte header
+  (RECORD_MAGIC, format version, board size), then per game one little-endian
+  uint16 frame word -- the stone count in its low 9 bits, the result above
+  them -- followed by one uint16 per stone, row * BOARD_SIZE + col.
+
+GameRecords reads a binary file through a memory map: opening it only indexes
+where each game starts, games come out as views of the map, and replay_boards /
+replay_positions build NumPy board tensors in jitted loops, so nothing is
+turned into Python objects per stone.
+
+    python connect6_records.py pack games.txt games.c6g
+    python connect6_records.py unpack games.c6g games.txt
+    python connect6_records.py info games.c6g
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+from numba import njit
+
+from connect6_engine import BOARD_SIZE, GameState, player_for_turn
+
+RECORD_MAGIC = b"C6GR"
+RECORD_VERSION = 1
+HEADER_BYTES = 8
+COUNT_BITS = 9  # frame word bits that hold the stone count, BOARD_SIZE ** 2 < 2 ** 9
+COUNT_MASK = (1 << COUNT_BITS) - 1
+
+# The result in a frame word; GameState.status() uses -1 for a game that goes on and 0 for a draw
+RESULT_CODES = {-1: 0, 1: 1, 2: 2, 0: 3}
+RESULT_STATUS = np.array([-1, 1, 2, 0], dtype=np.int8)
+RESULT_NAMES = {-1: "-", 0: "draw", 1: "black", 2: "red"}
+RESULT_BY_NAME = {name: status for status, name in RESULT_NAMES.items()}
+
+
+def header():
+    return RECORD_MAGIC + np.array([RECORD_VERSION, BOARD_SIZE], dtype="<u2").tobytes()
+
+
+def frame(cells, status):
+    """The uint16 words of one game: the frame word and its cells."""
+    cells = np.asarray(cells)
+    if len(cells) > BOARD_SIZE * BOARD_SIZE:
+        raise ValueError(f"{len(cells)} stones do not fit on the board")
+    if len(cells) and (cells.min() < 0 or cells.max() >= BOARD_SIZE * BOARD_SIZE):
+        raise ValueError("cell outside the board")
+    words = np.empty(len(cells) + 1, dtype="<u2")
+    words[0] = len(cells) | RESULT_CODES[status] << COUNT_BITS
+    words[1:] = cells
+    return words
+
+
+def game_cells(state):
+    """Cells of the stones on a GameState's board, in play order."""
+    return state.log["cell"][:state.ply]
+
+
+class RecordWriter:
+    """Appends games to a binary record file.
+
+        with RecordWriter("games.c6g") as writer:
+            writer.write(state)
+    """
+
+    def __init__(self, path, append=False):
+        self.file = open(path, "ab" if append else "wb")
+        if self.file.tell() == 0:
+            self.file.write(header())
+        self.games = 0
+
+    def write(self, game, status=None):
+        """Add one game: a GameState, or cells in play order with their status
+        (-1 while the game goes on, 0 draw, 1/2 the winner)."""
+        if isinstance(game, GameState):
+            cells, status = game_cells(game), game.status() if status is None else status
+        else:
+            cells, status = game, -1 if status is None else status
+        self.file.write(frame(cells, status).tobytes())
+        self.games += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@njit(cache=True)
+def index_records(data):
+    """Start (word offset of the first cell), stone count and result code of
+    every game in `data`, the uint16 words after the header. A game cut short
+    by the end of the data comes back as a count of -1, one with a cell word
+    off the board as -2: the replay kernels index arrays with the cells and
+    do no bounds checks."""
+    games = 0
+    i = 0
+    while i < data.size:
+        i += 1 + (data[i] & COUNT_MASK)
+        games += 1
+    starts = np.empty(games, dtype=np.int64)
+    counts = np.empty(games, dtype=np.int16)
+    results = np.empty(games, dtype=np.int8)
+    i = 0
+    for g in range(games):
+        count = data[i] & COUNT_MASK
+        starts[g] = i + 1
+        counts[g] = count if i + 1 + count <= data.size else -1
+        if counts[g] > 0:
+            for k in range(i + 1, i + 1 + count):
+                if data[k] >= BOARD_SIZE * BOARD_SIZE:
+                    counts[g] = -2
+                    break
+        results[g] = data[i] >> COUNT_BITS
+        i += 1 + count
+    return starts, counts, results
+
+
+@njit(cache=True)
+def replay_boards(data, starts, counts, games, plies, out):
+    """Fill out[k] with game games[k] after its first plies[k] stones
+    (all of them when the game is shorter)."""
+    for k in range(games.size):
+        board = out[k]
+        board[:] = 0
+        g = games[k]
+        n = min(plies[k], counts[g])
+        for i in range(n):
+            cell = data[starts[g] + i]
+            board[cell // BOARD_SIZE, cell % BOARD_SIZE] = player_for_turn(i)
+
+
+@njit(cache=True)
+def replay_positions(data, starts, counts, games, boards, to_move, next_cells):
+    """Every position of the given games, in order: boards[p] before the stone
+    next_cells[p] was played by player to_move[p]."""
+    p = 0
+    for k in range(games.size):
+        g = games[k]
+        board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+        for i in range(counts[g]):
+            cell = data[starts[g] + i]
+            boards[p] = board
+            to_move[p] = player_for_turn(i)
+            next_cells[p] = cell
+            board[cell // BOARD_SIZE, cell % BOARD_SIZE] = player_for_turn(i)
+            p += 1
+
+
+class GameRecords:
+    """The games of a binary record file, read through a memory map."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            head = file.read(HEADER_BYTES)
+            size = file.seek(0, 2)
+        if head[:4] != RECORD_MAGIC:
+            raise ValueError(f"{path} is not a game record file")
+        version, board_size = np.frombuffer(head, dtype="<u2", offset=4)
+        if version != RECORD_VERSION or board_size != BOARD_SIZE:
+            raise ValueError(f"{path}: version {version} for a {board_size}x{board_size} board is not supported")
+        if size > HEADER_BYTES:
+            # A plain ndarray view of the map, which the jitted functions take
+            self.data = np.asarray(np.memmap(path, dtype="<u2", mode="r", offset=HEADER_BYTES))
+        else:
+            self.data = np.empty(0, dtype="<u2")
+        self.starts, self.counts, codes = index_records(self.data)
+        if len(self.counts) and self.counts[-1] == -1:
+            raise ValueError(f"{path}: the last game is cut short")
+        off_board = np.flatnonzero(self.counts == -2)
+        if len(off_board):
+            raise ValueError(f"{path}: game {int(off_board[0])} has a cell off the board")
+        bad = np.flatnonzero((codes >= len(RESULT_STATUS)) | (self.counts > BOARD_SIZE * BOARD_SIZE))
+        if len(bad):
+            game = int(bad[0])
+            raise ValueError(f"{path}: game {game} has a corrupt frame word "
+                             f"({self.counts[game]} stones, result code {codes[game]})")
+        self.results = RESULT_STATUS[codes]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, game):
+        """Cells of one game in play order, a view of the file."""
+        start = self.starts[game]
+        return self.data[start:start + self.counts[game]]
+
+    def __iter__(self):
+        for game in range(len(self)):
+            yield self[game]
+
+    def result(self, game):
+        """Recorded status of a game: -1 unfinished, 0 draw, 1/2 the winner."""
+        return int(self.results[game])
+
+    def state(self, game, ply=None):
+        """A GameState of the game with its whole log, `ply` stones of it on the board."""
+        state = GameState()
+        for cell in self[game]:
+            state.play(*divmod(int(cell), BOARD_SIZE))
+        if ply is not None:
+            state.jump(min(ply, len(state)))
+        return state
+
+    def game_indices(self, games=None):
+        return np.arange(len(self)) if games is None else np.asarray(games, dtype=np.int64).reshape(-1)
+
+    def boards(self, games=None, ply=None, out=None):
+        """int8 boards (n, BOARD_SIZE, BOARD_SIZE) of the games after `ply`
+        stones (a number or one per game, None for the final position)."""
+        games = self.game_indices(games)
+        plies = np.broadcast_to(np.asarray(BOARD_SIZE * BOARD_SIZE if ply is None else ply, dtype=np.int64),
+                                games.shape)
+        if out is None:
+            out = np.empty((len(games), BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+        replay_boards(self.data, self.starts, self.counts, games, np.ascontiguousarray(plies), out)
+        return out
+
+    def positions(self, games=None):
+        """Every position of the games as (boards, to_move, next_cells): the
+        board before each stone, the player who placed it and its cell."""
+        games = self.game_indices(games)
+        total = int(self.counts[games].sum())
+        boards = np.empty((total, BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+        to_move = np.empty(total, dtype=np.int8)
+        next_cells = np.empty(total, dtype=np.int16)
+        replay_positions(self.data, self.starts, self.counts, games, boards, to_move, next_cells)
+        return boards, to_move, next_cells
+
+
+def format_game(cells, status=-1):
+    """One line of the text format."""
+    stones = " ".join(f"{cell // BOARD_SIZE},{cell % BOARD_SIZE}" for cell in map(int, cells))
+    return f"{RESULT_NAMES[status]} {stones}".rstrip()
+
+
+def parse_game(line):
+    """(cells, status) of one line of the text format."""
+    parts = line.split()
+    if not parts or parts[0] not in RESULT_BY_NAME:
+        raise ValueError(f"not a game record: {line!r}")
+    cells = np.empty(len(parts) - 1, dtype=np.int16)
+    for i, stone in enumerate(parts[1:]):
+        row, col = map(int, stone.split(","))
+        if not (0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE):
+            raise ValueError(f"stone {stone} outside the board")
+        cells[i] = row * BOARD_SIZE + col
+    return cells, RESULT_BY_NAME[parts[0]]
+
+
+def read_text(path):
+    """Yield (cells, status) for each game of a text file, one line at a time."""
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                yield parse_game(line)
+
+
+def write_text(path, games):
+    """Write (cells, status) pairs as a text file."""
+    with open(path, "w") as file:
+        for cells, status in games:
+            file.write(format_game(cells, status) + "\n")
+
+
+def pack(text_path, record_path):
+    """Convert a text file to a binary one, return the number of games."""
+    with RecordWriter(record_path) as writer:
+        for cells, status in read_text(text_path):
+            writer.write(cells, status)
+    return writer.games
+
+
+def unpack(record_path, text_path):
+    records = GameRecords(record_path)
+    write_text(text_path, ((records[game], records.result(game)) for game in range(len(records))))
+    return len(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("pack", help="text games to a binary record file")
+    command.add_argument("source")
+    command.add_argument("target")
+    command = commands.add_parser("unpack", help="binary record file to text games")
+    command.add_argument("source")
+    command.add_argument("target")
+    command = commands.add_parser("info", help="count the games of a binary file and time replaying them")
+    command.add_argument("source")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        print(f"{pack(args.source, args.target)} games written to {args.target}")
+    elif args.command == "unpack":
+        print(f"{unpack(args.source, args.target)} games written to {args.target}")
+    else:
+        start = time.perf_counter()
+        records = GameRecords(args.source)
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        records.boards()
+        replayed = time.perf_counter() - start
+        stones = int(records.counts.sum())
+        outcomes = {RESULT_NAMES[status]: int(np.count_nonzero(records.results == status))
+                    for status in RESULT_NAMES}
+        print(f"{len(records)} games, {stones} stones, results {outcomes}")
+        print(f"indexed in {indexed:.3f} s, final boards replayed in {replayed:.3f} s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""Headless self-play: the engine plays itself in a process pool and the
+positions it searched are written as sharded NumPy datasets.
+
+    python connect6_selfplay.py data --games 1000 --workers 8 --playouts 800
+
+Every searched position is one sample, spread over four arrays:
+
+    boards   int8 (n, BOARD_SIZE, BOARD_SIZE)  0 empty, 1 black, 2 red
+    to_move  int8 (n,)                         the player placing the next stone
+    visits   float32 (n, BOARD_SIZE ** 2)      root visits per cell, summing to 1
+    results  int8 (n,)                         final status of the game (GameState.status)
+
+A shard holds shard_size samples (the last one fewer) in one .npy file per
+array, named {prefix}-{shard:05d}-{array}.npy; np.load(path, mmap_mode="r")
+maps them. The games themselves go to {prefix}.c6g (see connect6_records).
+Another run into the same directory adds to the dataset: its games are
+appended to the .c6g and its shards numbered after the last one there.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+from connect6_engine import BOARD_SIZE, GameState, MonteCarloTreeSearch, warm_up
+from connect6_records import RecordWriter
+
+SHARD_SIZE = 16384  # samples per shard
+EXPLORE_STONES = 8  # stones at the start of a game picked in proportion to their visits, for variety
+MOVE_PLAYOUTS = 800
+MOVE_TIME = 5.0
+
+
+def play_game(engine, seed, budget, explore_stones=EXPLORE_STONES, max_stones=BOARD_SIZE * BOARD_SIZE):
+    """Play one game with `engine` on both sides.
+
+    `budget` holds findNextMove's budget arguments for every search. The
+    first stone goes to the centre unsearched. Returns the GameState and the
+    samples of the game as a dict of the arrays described above.
+    """
+    rng = random.Random(seed)
+    engine.rng.seed(seed)
+    state = GameState()
+    boards, to_move, visits = [], [], []
+    centre = BOARD_SIZE // 2
+    state.play(centre, centre)
+    engine.advance(centre, centre)
+    while state.status() == -1 and len(state) < max_stones:
+        best, _, _ = engine.find_move(state, **budget)
+        counts = engine.last_visits
+        boards.append(state.board.copy())
+        to_move.append(state.to_move())
+        visits.append(counts / max(counts.sum(), 1.0))
+
+        stones = [best.position] if best.position2 is None else [best.position, best.position2]
+        if best.position2 is None and len(state) < explore_stones and counts.sum() > 0:
+            cell = rng.choices(range(BOARD_SIZE * BOARD_SIZE), weights=counts)[0]
+            stones = [divmod(cell, BOARD_SIZE)]
+        for row, col in stones:
+            if state.status() == -1:
+                state.play(row, col)
+                engine.advance(row, col)
+
+    n = len(boards)
+    samples = {
+        "boards": np.array(boards, dtype=np.int8).reshape(n, BOARD_SIZE, BOARD_SIZE),
+        "to_move": np.array(to_move, dtype=np.int8),
+        "visits": np.array(visits, dtype=np.float32).reshape(n, BOARD_SIZE * BOARD_SIZE),
+        "results": np.full(n, state.status(), dtype=np.int8),
+    }
+    return state, samples
+
+
+class ShardWriter:
+    """Collects samples into fixed-size shards and writes them, along with the
+    games, on a background thread so the pool never waits for the disk."""
+
+    def __init__(self, directory, prefix="selfplay", shard_size=SHARD_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.shards = self.first_free_shard()
+        self.first_shard = self.shards
+        self.filled = 0
+        self.buffers = {
+            "boards": np.empty((shard_size, BOARD_SIZE, BOARD_SIZE), dtype=np.int8),
+            "to_move": np.empty(shard_size, dtype=np.int8),
+            "visits": np.empty((shard_size, BOARD_SIZE * BOARD_SIZE), dtype=np.float32),
+            "results": np.empty(shard_size, dtype=np.int8),
+        }
+        self.records = RecordWriter(os.path.join(directory, prefix + ".c6g"), append=True)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def first_free_shard(self):
+        """Number after the highest shard of this prefix already in the directory."""
+        pattern = re.compile(re.escape(self.prefix) + r"-(\d{5})-boards\.npy$")
+        numbers = [int(match.group(1)) for match in map(pattern.match, os.listdir(self.directory)) if match]
+        return max(numbers, default=-1) + 1
+
+    def put(self, cells, status, samples):
+        """Queue one game: its cells in play order, its status and its samples."""
+        self.queue.put((cells, status, samples))
+
+    def close(self):
+        """Write what is queued, the last partial shard included, and stop the thread."""
+        self.queue.put(None)
+        self.thread.join()
+        self.records.close()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            cells, status, samples = item
+            self.records.write(cells, status)
+            self.add(samples)
+        if self.filled:
+            self.flush()
+
+    def add(self, samples):
+        n, done = len(samples["to_move"]), 0
+        while done < n:
+            take = min(n - done, self.shard_size - self.filled)
+            for name, buffer in self.buffers.items():
+                buffer[self.filled:self.filled + take] = samples[name][done:done + take]
+            self.filled += take
+            done += take
+            if self.filled == self.shard_size:
+                self.flush()
+
+    def flush(self):
+        for name, buffer in self.buffers.items():
+            path = os.path.join(self.directory, f"{self.prefix}-{self.shards:05d}-{name}.npy")
+            np.save(path, buffer[:self.filled])
+        self.shards += 1
+        self.filled = 0
+
+
+_selfplay_engine = None
+
+
+def _init_selfplay(options):
+    global _selfplay_engine
+    warm_up()
+    _selfplay_engine = MonteCarloTreeSearch(**options)
+
+
+def _selfplay_game(task):
+    seed, budget, explore_stones, max_stones = task
+    state, samples = play_game(_selfplay_engine, seed, budget, explore_stones, max_stones)
+    return state.log["cell"][:len(state)].copy(), state.status(), samples
+
+
+def self_play(directory, games, workers=None, playouts=MOVE_PLAYOUTS, move_time=MOVE_TIME, seed=0,
+              shard_size=SHARD_SIZE, prefix="selfplay", explore_stones=EXPLORE_STONES,
+              max_stones=BOARD_SIZE * BOARD_SIZE, progress=None, **options):
+    """Play `games` games on `workers` processes (default: one per core) and
+    write them to `directory`. Every search gets `playouts` playouts and at
+    most `move_time` seconds; `options` go to MonteCarloTreeSearch. Game i
+    uses seed + i, but games are written in the order they finish. Returns
+    counts and positions per second as a dict.
+    """
+    workers = workers or os.cpu_count() or 1
+    budget = dict(max_playouts=playouts, max_time=move_time)
+    tasks = [(seed + i, budget, explore_stones, max_stones) for i in range(games)]
+    writer = ShardWriter(directory, prefix, shard_size)
+    positions = 0
+    start = time.time()
+    pool = None
+    try:
+        if workers > 1:
+            pool = multiprocessing.Pool(workers, initializer=_init_selfplay, initargs=(options,))
+            results = pool.imap_unordered(_selfplay_game, tasks)
+        else:
+            _init_selfplay(options)
+            results = map(_selfplay_game, tasks)
+        for done, (cells, status, samples) in enumerate(results, 1):
+            writer.put(cells, status, samples)
+            positions += len(samples["to_move"])
+            if progress is not None:
+                progress(done, positions, time.time() - start)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        writer.close()
+    seconds = time.time() - start
+    return {"games": games, "positions": positions, "shards": writer.shards - writer.first_shard, "workers": workers,
+            "seconds": seconds, "positions_per_s": positions / seconds}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="where the shards and the game records go")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="processes playing games (default: one per core)")
+    parser.add_argument("--playouts", type=int, default=MOVE_PLAYOUTS, help="playouts of each search")
+    parser.add_argument("--move-time", type=float, default=MOVE_TIME, help="seconds a search may take at most")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--prefix", default="selfplay")
+    parser.add_argument("--explore-stones", type=int, default=EXPLORE_STONES)
+    parser.add_argument("--max-stones", type=int, default=BOARD_SIZE * BOARD_SIZE,
+                        help="stop a game unfinished after this many stones")
+    parser.add_argument("--pair-moves", action="store_true")
+    parser.add_argument("--heavy-playouts", action="store_true")
+    parser.add_argument("--rave", action="store_true")
+    args = parser.parse_args(argv)
+
+    def progress(games, positions, seconds):
+        print(f"\r{games}/{args.games} games, {positions} positions, {positions / seconds:.1f} positions/s",
+              end="", file=sys.stderr)
+
+    report = self_play(args.directory, args.games, args.workers, args.playouts, args.move_time, args.seed,
+                       args.shard_size, args.prefix, args.explore_stones, args.max_stones, progress,
+                       pair_moves=args.pair_moves, heavy_playouts=args.heavy_playouts, rave=args.rave)
+    print(file=sys.stderr)
+    print(report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
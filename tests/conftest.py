@@ -0,0 +1,34 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The modules live at the top of the repository, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connect6_engine import BOARD_SIZE, GameState  # noqa: E402
+
+
+def random_moves(seed, count):
+    """`count` random stones in play order, none of which ends the game."""
+    rng = np.random.default_rng(seed)
+    moves = []
+    state = GameState()
+    for cell in rng.permutation(BOARD_SIZE * BOARD_SIZE):
+        row, col = divmod(int(cell), BOARD_SIZE)
+        state.play(row, col)
+        if state.status() != -1:
+            state.undo()
+            continue
+        moves.append((row, col))
+        if len(moves) == count:
+            break
+    return moves
+
+
+@pytest.fixture
+def win_moves():
+    """A game black wins with six along row 9, from (9, 9) to (9, 14)."""
+    return [(9, 9), (0, 0), (0, 1), (9, 10), (9, 11), (1, 0), (1, 1), (9, 12), (9, 13),
+            (2, 0), (2, 1), (9, 14)]
@@ -0,0 +1,55 @@
+"""bitboard_wins must give the same answer as the cell-walking check_win."""
+import numpy as np
+import pytest
+
+from connect6_engine import BOARD_SIZE, bitboard_from_board, bitboard_wins, check_win, directions
+
+
+def assert_agrees(board, cells):
+    lines = bitboard_from_board(board)
+    for row, col in cells:
+        player = int(board[row, col])
+        expected = bool(check_win(row, col, board, player))
+        assert bitboard_wins(lines, player, row, col) == expected, (row, col, player)
+
+
+@pytest.mark.parametrize("density", [0.3, 0.5, 0.7, 0.9])
+def test_random_boards(density):
+    rng = np.random.default_rng(int(density * 10))
+    for _ in range(50):
+        board = rng.choice(np.array([0, 1, 2], dtype=np.int8), size=(BOARD_SIZE, BOARD_SIZE),
+                           p=[1 - density, density / 2, density / 2])
+        assert_agrees(board, np.argwhere(board != 0))
+
+
+@pytest.mark.parametrize("length", [5, 6, 7])
+@pytest.mark.parametrize("direction", range(4))
+def test_lines_everywhere(direction, length):
+    """A line of `length` stones from every cell it fits in, edges and both diagonals included."""
+    dr, dc = directions[direction]
+    for row in range(BOARD_SIZE):
+        for col in range(BOARD_SIZE):
+            cells = [(row + i * dr, col + i * dc) for i in range(length)]
+            if not all(0 <= r < BOARD_SIZE and 0 <= c < BOARD_SIZE for r, c in cells):
+                continue
+            board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+            for r, c in cells:
+                board[r, c] = 1
+            lines = bitboard_from_board(board)
+            for r, c in cells:
+                assert bitboard_wins(lines, 1, r, c) == (length >= 6)
+            assert_agrees(board, cells)
+
+
+@pytest.mark.parametrize("direction", range(4))
+def test_line_broken_by_opponent(direction):
+    dr, dc = directions[direction]
+    row, col = (0, 0) if dc >= 0 else (0, BOARD_SIZE - 1)
+    cells = [(row + i * dr, col + i * dc) for i in range(7)]
+    board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+    for r, c in cells:
+        board[r, c] = 1
+    board[cells[3]] = 2
+    lines = bitboard_from_board(board)
+    assert not any(bitboard_wins(lines, 1, r, c) for r, c in cells if board[r, c] == 1)
+    assert_agrees(board, cells)
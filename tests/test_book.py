@@ -0,0 +1,74 @@
+"""Opening book: one key for all 8 symmetric positions, and lookups that respect them."""
+import numpy as np
+import pytest
+
+from conftest import random_moves
+from connect6_book import BOOK_DTYPE, SYMMETRIES, OpeningBook, build_book, canonical_hash, hash_table
+from connect6_engine import BOARD_SIZE, GameState
+from connect6_records import GameRecords, RecordWriter
+
+
+def random_cells(seed, count):
+    return [row * BOARD_SIZE + col for row, col in random_moves(seed, count)]
+
+
+def state_of(cells, t=0):
+    """GameState of the stones `cells` under symmetry t."""
+    return GameState([divmod(int(SYMMETRIES[t, cell]), BOARD_SIZE) for cell in cells])
+
+
+def key_of(state):
+    cells = np.flatnonzero(state.board)
+    return canonical_hash(cells, state.board.ravel()[cells].astype(np.int64))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_canonical_hash_is_symmetric(seed):
+    cells = random_cells(seed, 15)
+    keys = {key_of(state_of(cells, t))[0] for t in range(8)}
+    assert len(keys) == 1
+
+
+@pytest.fixture
+def book(tmp_path):
+    """A book of 6 random games (all their positions of 1 to 9 stones) and the games."""
+    games = [random_cells(100 + seed, 12) for seed in range(6)]
+    path = tmp_path / "games.c6g"
+    with RecordWriter(path) as writer:
+        for cells in games:
+            writer.write(np.array(cells), -1)
+    return OpeningBook(build_book(GameRecords(path), stones=10, min_games=1)), games
+
+
+def test_lookup_under_every_symmetry(book):
+    book, games = book
+    for cells in games:
+        # From 3 stones on the random positions have no symmetry of their own, so the move is unique
+        for ply in range(3, 10):
+            for t in range(8):
+                found = book.find_move(state_of(cells[:ply], t))
+                assert found is not None
+                assert found.position == divmod(int(SYMMETRIES[t, cells[ply]]), BOARD_SIZE), (ply, t)
+                assert found.visitCount == 1
+
+
+def test_unknown_position(book):
+    book, _ = book
+    assert book.find_move(state_of(random_cells(999, 6))) is None
+    assert book.find_move(GameState()) is None
+
+
+def test_collision_on_an_occupied_cell_falls_back():
+    state = state_of(random_cells(7, 8))
+    key, t = key_of(state)
+    occupied = state.log["cell"][0]
+    entries = np.zeros(1, dtype=BOOK_DTYPE)
+    # Moves are stored in the orientation of the canonical key
+    entries["key"], entries["move"], entries["games"] = key, SYMMETRIES[t, occupied], 5
+    book = OpeningBook(hash_table(entries))
+    assert book.probe(key) != -1
+    assert book.find_move(state) is None
+
+    free = next(cell for cell in range(BOARD_SIZE * BOARD_SIZE) if state.board.ravel()[cell] == 0)
+    entries["move"] = SYMMETRIES[t, free]
+    assert OpeningBook(hash_table(entries)).find_move(state).position == divmod(free, BOARD_SIZE)
@@ -0,0 +1,111 @@
+"""GameState history: undo, redo, jump and save/load against a fresh replay."""
+import numpy as np
+import pytest
+
+from conftest import random_moves
+from connect6_engine import BOARD_SIZE, GameState, player_for_turn
+
+
+def assert_same(state, expected):
+    assert np.array_equal(state.board, expected.board)
+    assert len(state) == len(expected)
+    assert state.moves == expected.moves
+    assert state.status() == expected.status()
+    assert state.to_move() == expected.to_move()
+    assert state.stones_left() == expected.stones_left()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_undo_redo_jump_match_replay(seed):
+    moves = random_moves(seed, 40)
+    state = GameState(moves)
+    for ply in (39, 17, 0, 25, 40, 3):
+        state.jump(ply)
+        assert_same(state, GameState(moves[:ply]))
+
+    state.jump(40)
+    for ply in range(40, 0, -1):
+        assert state.undo() == moves[ply - 1]
+        assert_same(state, GameState(moves[:ply - 1]))
+    for ply in range(1, 41):
+        assert state.redo() == moves[ply - 1]
+        assert_same(state, GameState(moves[:ply]))
+    with pytest.raises(IndexError):
+        state.redo()
+
+
+def test_jump_back_before_a_pair_turn():
+    moves = random_moves(3, 12)
+    state = GameState(moves)
+    # Stones 1 and 2 are red's first pair: go back to before it, and to its middle
+    assert player_for_turn(1) == player_for_turn(2) == 2
+    state.jump(1)
+    assert_same(state, GameState(moves[:1]))
+    assert state.to_move() == 2 and state.stones_left() == 2
+    state.jump(2)
+    assert state.stones_left() == 1
+
+    # A different stone in the middle of the pair drops the rest of the log
+    state.jump(1)
+    other = next((r, c) for r in range(BOARD_SIZE) for c in range(BOARD_SIZE)
+                 if (r, c) not in moves)
+    state.play(*other)
+    assert_same(state, GameState(moves[:1] + [other]))
+    with pytest.raises(IndexError):
+        state.redo()
+
+    # Replaying the logged stone instead keeps the redo tail
+    state = GameState(moves)
+    state.jump(1)
+    state.play(*moves[1])
+    state.jump(len(moves))
+    assert_same(state, GameState(moves))
+
+
+def test_win_is_undone_and_redone(win_moves):
+    state = GameState(win_moves)
+    assert state.status() == 1
+    state.undo()
+    assert state.status() == -1
+    state.redo()
+    assert state.status() == 1
+    assert sorted(state.winning_line()) == [(9, c) for c in range(9, 15)]
+
+
+@pytest.mark.parametrize("ply", [0, 1, 2, 3, 23])
+def test_save_and_load(tmp_path, ply):
+    moves = random_moves(4, 23)
+    state = GameState(moves)
+    state.jump(ply)
+    path = tmp_path / "moves.txt"
+    state.save(path)
+    loaded = GameState.load(path)
+    # Only the stones on the board are saved
+    assert_same(loaded, GameState(moves[:ply]))
+    with pytest.raises(IndexError):
+        loaded.redo()
+
+
+def test_out_of_order_save_keeps_its_six(tmp_path):
+    """A row-by-row save whose six is not the last stone in replay order."""
+    black = [(0, c) for c in range(6)] + [(10, 10)]
+    red = [(5, c) for c in range(0, 12, 2)] + [(12, 0)]
+    lines = sorted([(r, c, "black") for r, c in black] + [(r, c, "red") for r, c in red])
+    path = tmp_path / "moves.txt"
+    path.write_text("".join(f"{r} {c} {color}\n" for r, c, color in lines))
+
+    state = GameState.load(path)
+    assert len(state) == 14 and state.last_move == (12, 0)
+    assert state.status() == 1
+    assert sorted(state.winning_line()) == [(0, c) for c in range(6)]
+
+    # Taking back stones outside the six leaves the game won
+    for expected in [(12, 0), (10, 10)]:
+        assert state.undo() == expected
+        assert state.status() == 1 and not state.is_legal(18, 18)
+        assert sorted(state.winning_line()) == [(0, c) for c in range(6)]
+    # Taking back one of the six reopens it
+    assert state.undo() == (0, 5)
+    assert state.status() == -1 and state.winning_line() == []
+    state.redo()
+    assert state.status() == 1
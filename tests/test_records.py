@@ -0,0 +1,138 @@
+"""Text and binary game records: round trips, the index and board replay."""
+import numpy as np
+import pytest
+
+from conftest import random_moves
+from connect6_engine import BOARD_SIZE, GameState
+from connect6_records import (HEADER_BYTES, GameRecords, RecordWriter, format_game, frame, header, pack,
+                              parse_game, read_text, unpack, write_text)
+
+
+def cells_of(state):
+    return state.log["cell"][:len(state)].copy()
+
+
+@pytest.fixture
+def games(win_moves):
+    """(cells, status) pairs: unfinished games of several lengths, the empty game, a win and a draw."""
+    result = [(cells_of(GameState(random_moves(seed, stones))), -1)
+              for seed, stones in enumerate([1, 2, 3, 17, 60, 200])]
+    result += [(np.empty(0, dtype=np.int16), -1), (cells_of(GameState(win_moves)), 1),
+               (cells_of(GameState(random_moves(9, 30))), 0)]
+    return result
+
+
+def test_text_round_trip(tmp_path, games):
+    path = tmp_path / "games.txt"
+    write_text(path, games)
+    loaded = list(read_text(path))
+    assert len(loaded) == len(games)
+    for (cells, status), (expected_cells, expected_status) in zip(loaded, games):
+        assert np.array_equal(cells, expected_cells)
+        assert status == expected_status
+    cells, status = parse_game(format_game(*games[3]))
+    assert np.array_equal(cells, games[3][0]) and status == games[3][1]
+
+
+def test_parse_game_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_game("winner 9,9")
+    with pytest.raises(ValueError):
+        parse_game(f"black 9,{BOARD_SIZE}")
+
+
+def test_binary_round_trip_and_index(tmp_path, games, win_moves):
+    path = tmp_path / "games.c6g"
+    with RecordWriter(path) as writer:
+        for cells, status in games:
+            writer.write(cells, status)
+        writer.write(GameState(win_moves))
+    records = GameRecords(path)
+    assert len(records) == len(games) + 1
+
+    # The index points into the map: one frame word before every game
+    expected_start = 1
+    for game, (cells, status) in enumerate(games):
+        assert records.starts[game] == expected_start
+        assert records.counts[game] == len(cells)
+        assert np.array_equal(records[game], cells)
+        assert records.result(game) == status
+        expected_start += len(cells) + 1
+    assert isinstance(records.data.base, np.memmap)
+    assert records.data.size * 2 + HEADER_BYTES == path.stat().st_size
+
+    state = records.state(len(games))
+    assert state.moves == win_moves and state.status() == 1
+
+
+def test_append(tmp_path, games):
+    path = tmp_path / "games.c6g"
+    for cells, status in games:
+        with RecordWriter(path, append=True) as writer:
+            writer.write(cells, status)
+    records = GameRecords(path)
+    assert [records.result(game) for game in range(len(records))] == [status for _, status in games]
+
+
+def test_pack_unpack(tmp_path, games):
+    write_text(tmp_path / "a.txt", games)
+    assert pack(tmp_path / "a.txt", tmp_path / "a.c6g") == len(games)
+    assert unpack(tmp_path / "a.c6g", tmp_path / "b.txt") == len(games)
+    assert (tmp_path / "a.txt").read_text() == (tmp_path / "b.txt").read_text()
+
+
+def test_replay_matches_game_state(tmp_path, games):
+    path = tmp_path / "games.c6g"
+    with RecordWriter(path) as writer:
+        for cells, status in games:
+            writer.write(cells, status)
+    records = GameRecords(path)
+
+    for ply in (0, 1, 2, 5, None):
+        boards = records.boards(ply=ply)
+        for game in range(len(records)):
+            assert np.array_equal(boards[game], records.state(game, ply).board), (game, ply)
+
+    boards, to_move, next_cells = records.positions()
+    p = 0
+    for game in range(len(records)):
+        state = records.state(game, 0)
+        for cell in records[game]:
+            assert np.array_equal(boards[p], state.board)
+            assert to_move[p] == state.to_move()
+            assert next_cells[p] == cell
+            state.play(*divmod(int(cell), BOARD_SIZE))
+            p += 1
+    assert p == len(boards)
+
+
+def test_corrupt_files(tmp_path, games):
+    path = tmp_path / "games.c6g"
+    with RecordWriter(path) as writer:
+        for cells, status in games:
+            writer.write(cells, status)
+    data = path.read_bytes()
+
+    # A result code above 3 in the first frame word
+    word = np.frombuffer(data, dtype="<u2", count=1, offset=HEADER_BYTES)[0] | (5 << 9)
+    (tmp_path / "code.c6g").write_bytes(data[:HEADER_BYTES] + np.uint16(word).tobytes() + data[HEADER_BYTES + 2:])
+    with pytest.raises(ValueError, match="corrupt"):
+        GameRecords(tmp_path / "code.c6g")
+
+    # A cell word past the last cell of the board in the first game
+    bad_cell = np.uint16(60000).tobytes()
+    (tmp_path / "cell.c6g").write_bytes(data[:HEADER_BYTES + 2] + bad_cell + data[HEADER_BYTES + 4:])
+    with pytest.raises(ValueError, match="off the board"):
+        GameRecords(tmp_path / "cell.c6g")
+    one_game = header() + frame([0], -1).tobytes()[:2] + bad_cell
+    (tmp_path / "one.c6g").write_bytes(one_game)
+    with pytest.raises(ValueError, match="off the board"):
+        GameRecords(tmp_path / "one.c6g")
+
+    (tmp_path / "short.c6g").write_bytes(data[:-2])
+    with pytest.raises(ValueError, match="cut short"):
+        GameRecords(tmp_path / "short.c6g")
+
+    (tmp_path / "magic.c6g").write_bytes(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        GameRecords(tmp_path / "magic.c6g")
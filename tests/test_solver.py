@@ -0,0 +1,118 @@
+"""Threat solver: its wins hold against every defence, and its forced defences are the only ones."""
+from itertools import combinations
+
+import numpy as np
+
+from connect6_engine import (BOARD_SIZE, SOLVE_DEFEND, SOLVE_LOSS, SOLVE_WIN, check_win, player_for_turn,
+                             solve)
+
+# Far from everything the positions below play, and never four to a window
+FILLER = [(0, col) for col in range(0, BOARD_SIZE, 3)] + [(BOARD_SIZE - 1, col) for col in range(0, BOARD_SIZE, 3)]
+
+# Every window of six cells, as flat cell indices, found without the engine's own tables
+WINDOWS = np.array([[(row + k * dr) * BOARD_SIZE + col + k * dc for k in range(6)]
+                    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1))
+                    for row in range(BOARD_SIZE) for col in range(BOARD_SIZE)
+                    if 0 <= row + 5 * dr < BOARD_SIZE and 0 <= col + 5 * dc < BOARD_SIZE])
+
+
+def position(mover, other):
+    """Board and turn (the index of the last stone) where the player with the
+    stones `mover` has a whole turn of two stones to play. `other` is padded
+    with FILLER to the stone count that makes it so."""
+    other = list(other) + [cell for cell in FILLER if cell not in mover][:len(mover) + 1 - len(other)]
+    turn = len(mover) + len(other) - 1
+    player = player_for_turn(turn + 1)
+    assert player_for_turn(turn + 2) == player
+    board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int8)
+    for stones, color in ((mover, player), (other, 3 - player)):
+        for row, col in stones:
+            board[row, col] = color
+    return board, turn
+
+
+def threats(board, player):
+    """Windows `player` can fill with two more stones, by brute force."""
+    cells = board.ravel()[WINDOWS]
+    open_windows = ((cells == 3 - player).sum(axis=1) == 0) & ((cells == player).sum(axis=1) >= 4)
+    return WINDOWS[open_windows]
+
+
+def play(board, cells, player):
+    board = board.copy()
+    for cell in cells:
+        board[cell] = player
+    return board
+
+
+def assert_forced_win(board, turn, depth):
+    """The solver wins within `depth` turns from here, and after every reply
+    that blocks its threats it wins again with a turn less."""
+    attacker = player_for_turn(turn + 1)
+    solution = solve(board, turn, max_time=10, max_depth=max(depth, 1))
+    assert solution.status == SOLVE_WIN
+    assert solution.depth <= depth
+    assert 1 <= len(solution.cells) <= 2
+    assert all(board[cell] == 0 for cell in solution.cells)
+    board = play(board, solution.cells, attacker)
+    if any(check_win(row, col, board, attacker) for row, col in solution.cells):
+        return
+    assert depth > 0
+    assert len(threats(board, 3 - attacker)) == 0
+    windows = threats(board, attacker)
+    assert len(windows) > 0
+    # Only stones on the threatened windows can stop them, and one stone never does
+    cells = [cell for cell in np.unique(windows) if board.ravel()[cell] == 0]
+    assert all((windows != cell).all(axis=1).any() for cell in cells)
+    for reply in combinations([divmod(int(cell), BOARD_SIZE) for cell in cells], 2):
+        after = play(board, reply, 3 - attacker)
+        if len(threats(after, attacker)):
+            continue
+        assert_forced_win(after, turn + 4, depth - 1)
+
+
+def test_immediate_win():
+    board, turn = position([(9, 5), (9, 6), (9, 7), (9, 8)], [(8, 5), (10, 5), (8, 6), (10, 6), (8, 7)])
+    solution = solve(board, turn)
+    assert solution.status == SOLVE_WIN and solution.depth == 0
+    attacker = player_for_turn(turn + 1)
+    after = play(board, solution.cells, attacker)
+    assert any(check_win(row, col, after, attacker) for row, col in solution.cells)
+
+
+def test_two_fours_win_in_one_turn():
+    # Two threes far apart: a stone on each makes two fours, which take four blocks
+    board, turn = position([(5, 5), (5, 6), (5, 7), (12, 5), (12, 6), (12, 7)], [])
+    assert_forced_win(board, turn, 1)
+
+
+def test_win_in_two_turns():
+    attacker = [(8, 11), (8, 10), (7, 5), (10, 8), (11, 8), (11, 12)]
+    defender = [(5, 6), (6, 10), (10, 13), (7, 12), (11, 11), (12, 5), (13, 10)]
+    board, turn = position(attacker, defender)
+    assert solve(board, turn, max_time=10, max_depth=1).status != SOLVE_WIN
+    assert_forced_win(board, turn, 2)
+
+
+def test_single_block():
+    # Five in a row: the cells just past both ends are the one defence
+    line = [(9, col) for col in range(5, 10)]
+    board, turn = position([(3, 3), (3, 8), (15, 3), (15, 8)], line)
+    solution = solve(board, turn)
+    assert solution.status == SOLVE_DEFEND
+    assert sorted(solution.cells) == [(9, 4), (9, 10)]
+
+    opponent = 3 - player_for_turn(turn + 1)
+    assert len(threats(play(board, solution.cells, 3 - opponent), opponent)) == 0
+    # Stones off row 9 touch none of its windows, so trying the row is exhaustive
+    empty = [(9, col) for col in range(BOARD_SIZE) if board[9, col] == 0]
+    for reply in list(combinations(empty, 2)) + [(cell,) for cell in empty]:
+        if sorted(reply) != [(9, 4), (9, 10)]:
+            assert len(threats(play(board, reply, 3 - opponent), opponent)) > 0
+
+
+def test_unstoppable_threats_lose():
+    # Two fives: four cells to block with two stones
+    lines = [(9, col) for col in range(5, 10)] + [(13, col) for col in range(5, 10)]
+    board, turn = position([(3, 3), (3, 8), (15, 3), (15, 8), (5, 14), (7, 14), (11, 14), (16, 16), (2, 17)], lines)
+    assert solve(board, turn).status == SOLVE_LOSS